@@ -11,12 +11,12 @@
 """ Set of constants used in the game """
 
 # Size of grids square size: subsquare sizes
-SIZE_DICT = {4: (2, 2), 6: (3, 2), 8: (4, 2), 9: (3, 3), 10: (5, 2), 12: (4, 3)}
+SIZE_DICT = {4: (2, 2), 6: (3, 2), 8: (4, 2), 9: (3, 3), 10: (5, 2), 12: (4, 3), 16: (4, 4), 25: (5, 5)}
 # Following not implemented
-# {14: (7, 2), 15: (5, 3), 16: (4, 4),20: (5, 4), 25: (5, 5)}
+# {14: (7, 2), 15: (5, 3), 20: (5, 4)}
 
 # All digits used
-DIGITS = "123456789ABC"
+DIGITS = "123456789ABCDEFGHIJKLMNOP"
 
 SIZE = 9  # Default number of squares on a side.
 MID_ROW = SIZE / 2  # The coordinates of the center (starting) square.
@@ -26,6 +26,9 @@ WIDTH = 50  # Width of each square/tile
 HEIGHT = 50  # Height of each square/tile
 MARGIN = 5  # Margin between each cell
 INT_CELLS = 3
+CELL_SIZE = {16: 36, 25: 21}  # Smaller squares/tiles for boards too big for WIDTH
+HINT_FONT = {16: 9, 25: 7}  # Smaller font for possibles on tiles of these boards
+PRINT_FONT = {16: 12, 25: 7}  # Smaller font for printing these boards
 
 # Board square colours
 NORMAL_COLOUR = (255, 255, 255)
@@ -74,16 +77,21 @@ INSTR_RECT = [SQUARE_X - 10, SQUARE_Y + SQUARE_HEIGHT + 40, SQUARE_WIDTH + 20, 6
 
 FUNC_MSGS = ["Naked Singles\nOnly one possibility in the cell",
              "Hidden Singles\nOnly one possible but hidden",
-             "Pointing Pair\nThis adjusts possibles but does not set any numbers",
+             "Locked Candidates\nPointing and claiming - this adjusts possibles but does not set any numbers",
              "Block-Block\nThis adjusts possibles but does not set any numbers",
              "Naked Subsets\nThis adjusts possibles but does not set any numbers",
              "Hidden Subsets\nThis adjusts possibles but does not set any numbers",
+             "Fish\nX-Wing, Swordfish or Jellyfish - this adjusts possibles but does not set any numbers",
+             "Wings and Colouring\nXY-Wing, XYZ-Wing or simple colouring - "
+             "this adjusts possibles but does not set any numbers",
+             "Templates\nEvery way of placing a digit checked - this adjusts possibles but does not set any numbers",
+             "Forcing Chains\nEach possible tried in turn and followed through singles",
              "Backtracking\nThis tries all possible values in turn"]
 
 #  SVG for tile
 
 SVG_DATA_1 = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg width="50" height="50" id="smile" version="1.1">
+<svg width="{size}" height="{size}" viewBox="0 0 50 50" id="smile" version="1.1">
     <rect x="0" y="0" rx="5" ry="5" width="50" height="50"
      style="fill:white;stroke:white;stroke-width:1;fill-opacity:0; stroke-opacity:0" />
     <text x="25" y="32" font-family="Arial, sans-serif" font-size="28pt" font-weight="bold" 
@@ -93,11 +101,11 @@ SVG_DATA_1 = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 #  SVG for hints
 
 SVG_HINT_1 = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg width="50" height="50" viewBox="0 0 50 50" id="hint" version="1.1">"""
+<svg width="{size}" height="{size}" viewBox="0 0 50 50" id="hint" version="1.1">"""
 
 SVG_HINT_2 = """<line x1="{start_x}" x2="{end_x}" y1="{start_y}" y2="{end_y}" stroke="gray" stroke-width="1"/>"""
 
-SVG_HINT_3 = """<text x="{x}" y="{y}" font-family="Arial, sans-serif" font-size="12pt" 
+SVG_HINT_3 = """<text x="{x}" y="{y}" font-family="Arial, sans-serif" font-size="{font}pt" 
 text-anchor="middle" dominant-baseline="middle" fill="black">{num}</text>"""
 
 # SVG for printing grid
@@ -0,0 +1,131 @@
+""" Solver backends behind one solve interface
+    Each backend fills a grid in place using a Solver and one of its searches
+    choose_backend() picks one from board size and number of clues
+    Run as a script to compare two backends over a puzzle file:
+        python qbackends.py puzzles.txt logic cover """
+
+import sys
+import time
+
+import Constants as Cons
+import qgrid
+import qsolver
+
+# {name: (logical stages first, Solver search method)}
+BACKENDS = {"logic": (True, "search"),
+            "mrv": (False, "search"),
+            "cover": (False, "cover_search"),
+            "learning": (False, "learning_search")}
+
+# Tries each search makes before giving up when a limit is wanted, about ten seconds on a 25 x 25 board
+NODE_LIMITS = {"logic": 10000, "mrv": 10000, "cover": 500000, "learning": 7000}
+
+LARGE_BOARD = 16  # From this size exact cover is quickest whatever the clues
+SPARSE_CLUES = 0.25  # Below this share of cells set exact cover is quickest
+
+
+def choose_backend(grid):
+    """ Return name of backend to use for grid
+        The logical stages are slower than any search when only the solution is wanted """
+    size = grid.size
+    if size >= LARGE_BOARD or grid.filled < SPARSE_CLUES * size * size:
+        return "cover"
+    return "mrv"
+
+
+def limit(grid, name=None):
+    """ Return NODE_LIMITS entry for backend name, or the one chosen for grid """
+    return NODE_LIMITS[choose_backend(grid) if name is None else name]
+
+
+def set_search(solver, name):
+    """ Make solver backtrack with search of backend name """
+    solver.search_func = getattr(solver, BACKENDS[name][1])
+
+
+def solve(grid, name=None, node_limit=None, stop_event=None):
+    """ Fill grid in place with backend name, or the one chosen for it
+        Search gives up after node_limit tries if given, see limit(), or once threading.Event stop_event is set
+        Returns (solved, nodes searched) """
+    if name is None:
+        name = choose_backend(grid)
+    solver = qsolver.Solver()
+    solver.initialize(grid)
+    solver.node_limit = node_limit
+    solver.stop_event = stop_event
+    set_search(solver, name)
+    if BACKENDS[name][0]:
+        solver.solve()
+    elif solver.contradiction is None:
+        solver.search_func()
+    return solver.is_complete(), solver.nodes
+
+
+# -------------------------------------------------------------------------
+# A/B comparison
+
+def read_puzzles(filename):
+    """ Return list of qgrid.Grid from puzzle file
+        Either one puzzle on each line, or each puzzle on one line for each row
+        with optional separator lines between, '.' or '0' for blank """
+    with open(filename, "r") as f:
+        lines = [line.strip() for line in f]
+    grids = []
+    pos = 0
+    while pos < len(lines):
+        line = lines[pos]
+        size = int(len(line) ** 0.5)
+        rows = lines[pos:pos + len(line)]
+        if len(line) in Cons.SIZE_DICT and len(rows) == len(line) and all(len(row) == len(line) for row in rows):
+            grids.append(qgrid.Grid.from_text("".join(rows), len(line)))
+            pos += len(line)
+        elif size in Cons.SIZE_DICT and size * size == len(line):
+            grids.append(qgrid.Grid.from_text(line, size))
+            pos += 1
+        else:
+            pos += 1
+    return grids
+
+
+def compare(filename, name_a, name_b):
+    """ Solve every puzzle in filename with both backends
+        Returns {name: (total seconds, total nodes, puzzles solved)} and
+        {"same": count, "different": count, "mismatch": count} where
+        different means both solved with different solutions and mismatch that only one solved """
+    totals = {name_a: [0.0, 0, 0], name_b: [0.0, 0, 0]}
+    agreement = {"same": 0, "different": 0, "mismatch": 0}
+    for grid in read_puzzles(filename):
+        results = []
+        for name in (name_a, name_b):
+            copy = grid.copy()
+            start = time.perf_counter()
+            solved, nodes = solve(copy, name)
+            total = totals[name]
+            total[0] += time.perf_counter() - start
+            total[1] += nodes
+            total[2] += solved
+            results.append((solved, copy))
+        if results[0][0] != results[1][0]:
+            agreement["mismatch"] += 1
+        elif results[0][1] == results[1][1]:
+            agreement["same"] += 1
+        else:
+            agreement["different"] += 1
+    return {name: tuple(total) for name, total in totals.items()}, agreement
+
+
+def main(args):
+    """ Compare two backends over a puzzle file and print report """
+    if len(args) != 3 or args[1] not in BACKENDS or args[2] not in BACKENDS:
+        print("Usage: qbackends.py puzzles.txt backend backend")
+        print("Backends:", ", ".join(BACKENDS))
+        return
+    totals, agreement = compare(*args)
+    print("{:10} {:>10} {:>10} {:>8}".format("Backend", "Seconds", "Nodes", "Solved"))
+    for name, (seconds, nodes, solved) in totals.items():
+        print("{:10} {:>10.3f} {:>10} {:>8}".format(name, seconds, nodes, solved))
+    print("Same {same}  Different solutions {different}  Only one solved {mismatch}".format(**agreement))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
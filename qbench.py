@@ -0,0 +1,80 @@
+""" Timing of each solver stage over a puzzle file
+    Every puzzle goes through the logical stages, then the search of the backend chosen for it
+    Searches give up after qbackends.NODE_LIMITS tries, boards given up count as not solved
+    Run as a script to report the slowest board for each stage and size:
+        python qbench.py data/big16.txt data/big25.txt data/sparse25.txt """
+
+import sys
+import time
+
+import qbackends
+import qsolver
+
+LIMIT = 1.0  # Seconds any stage may take on one board
+
+
+def time_board(grid, name=None):
+    """ Solve grid with logical stages then search of backend name, or the one chosen for it
+        Returns (solved, {stage: seconds}) with time for all calls of each stage on the board """
+    times = dict()
+
+    def timed(stage):
+        def run(units):
+            start = time.perf_counter()
+            stage(units)
+            times[stage_name(stage)] = times.get(stage_name(stage), 0.0) + time.perf_counter() - start
+        return run
+
+    solver = qsolver.Solver()
+    solver.initialize(grid)
+    solver.stages = [timed(stage) for stage in solver.stages]
+    qbackends.set_search(solver, qbackends.choose_backend(grid) if name is None else name)
+    solver.node_limit = qbackends.limit(grid, name)
+    if solver.contradiction is None:
+        solver.propagate()
+        start = time.perf_counter()
+        solver.backtrack()
+        times["search"] = time.perf_counter() - start
+    return solver.is_complete(), times
+
+
+def stage_name(stage):
+    """ Return name of propagate stage without its _units suffix """
+    return stage.__name__.rsplit("_units", 1)[0]
+
+
+def benchmark(filenames, name=None):
+    """ Time every puzzle in filenames
+        Returns {size: (boards, solved, {stage: seconds on slowest board})} """
+    results = dict()
+    for filename in filenames:
+        for grid in qbackends.read_puzzles(filename):
+            solved, times = time_board(grid, name)
+            boards, total, worst = results.get(grid.size, (0, 0, dict()))
+            for stage, seconds in times.items():
+                worst[stage] = max(worst.get(stage, 0.0), seconds)
+            results[grid.size] = (boards + 1, total + solved, worst)
+    return results
+
+
+def main(args):
+    """ Benchmark puzzle files and print slowest time of each stage by board size """
+    name = None
+    if args and args[0] in qbackends.BACKENDS:
+        name, args = args[0], args[1:]
+    if not args:
+        print("Usage: qbench.py [backend] puzzles.txt ...")
+        print("Backends:", ", ".join(qbackends.BACKENDS))
+        return
+    over = 0
+    for size, (boards, solved, worst) in sorted(benchmark(args, name).items()):
+        print("{0} x {0}: {1} boards, {2} solved".format(size, boards, solved))
+        for stage, seconds in sorted(worst.items(), key=lambda item: -item[1]):
+            flag = " over {:.1f}s".format(LIMIT) if seconds > LIMIT else ""
+            over += bool(flag)
+            print("    {:16} {:>8.3f}{}".format(stage, seconds, flag))
+    print("Stages over limit:", over)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+""" Lookup tables and helpers for candidate bitmasks
+    Bit i of a mask is set if digit Cons.DIGITS[i] is possible """
+
+TABLE_BITS = 16  # Masks of up to this many digits are in the tables from the start
+TABLE_SIZE = 1 << TABLE_BITS
+
+
+class _Table(dict):
+    """ Values for every mask of up to TABLE_BITS digits
+        Larger masks are split in two, joined and kept on first use
+        A mask joined by two threads at once gets the same value, so tables need no lock """
+
+    def __init__(self, values, join):
+
+        super().__init__(enumerate(values))
+        self.join = join  # Function of values for low and high part of mask
+
+    def __missing__(self, mask):
+        value = self.join(self[mask & (TABLE_SIZE - 1)], self[mask >> TABLE_BITS])
+        self[mask] = value
+        return value
+
+
+def _join_low(low, high):
+    """ Lowest digit from those of the low and high parts of a mask """
+    if low >= 0 or high < 0:
+        return low
+    return high + TABLE_BITS
+
+
+def _make_tables():
+    """ Build popcount, lowest bit and bit index tables for every mask """
+    pop_count = [0] * TABLE_SIZE
+    low_bit = [-1] * TABLE_SIZE
+    bit_list = [()] * TABLE_SIZE
+    for mask in range(1, TABLE_SIZE):
+        pop_count[mask] = pop_count[mask >> 1] + (mask & 1)
+        low = (mask & -mask).bit_length() - 1
+        low_bit[mask] = low
+        bit_list[mask] = (low,) + bit_list[mask & (mask - 1)]
+    return (_Table(pop_count, lambda low, high: low + high),
+            _Table(low_bit, _join_low),
+            _Table(bit_list, lambda low, high: low + tuple(i + TABLE_BITS for i in high)))
+
+
+# POP_COUNT[mask]: number of digits in mask
+# LOW_BIT[mask]: index of lowest digit in mask (-1 if empty)
+# BIT_LIST[mask]: tuple of indices of all digits in mask
+POP_COUNT, LOW_BIT, BIT_LIST = _make_tables()
+
+
+def full_mask(size):
+    """ Mask with all digits of a board of size set """
+    return (1 << size) - 1
+
+
+def mask_digits(mask, digits):
+    """ Return list of digit characters in mask """
+    return [digits[i] for i in BIT_LIST[mask]]
@@ -2,11 +2,13 @@
 """ Sets up the game playboard """
 
 from PyQt5.QtCore import (QPointF, Qt, QObject, QPoint, pyqtProperty, QRectF, pyqtSignal)
-from PyQt5.QtGui import (QColor, QPixmap, QTransform, QImage)
+from PyQt5.QtGui import (QColor, QPixmap, QTransform, QImage, QFont)
 from PyQt5.QtWidgets import (QGraphicsItem, QGraphicsPixmapItem, QGraphicsRectItem,
                              QLabel, QGraphicsProxyWidget)
 
 import Constants as Cons
+import qgeometry
+import qgrid
 
 
 # PyQt doesn't support deriving from more than one wrapped class so we use
@@ -67,12 +69,14 @@ class Board:
         self.buttons = None
         self.background_item = None
 
-        self.content = None  # All digits on board by row, col
-        self.sudoku = None  # Original digits on board by row, col
+        self.content = None  # All digits on board as qgrid.Grid
+        self.sudoku = None  # Original digits on board as qgrid.Grid
+        self.start = None  # Snapshot of content when play started, for restart
         self.tiles = None  # Tiles on board by row, col
         self.poss_tiles = None  # Possibles tiles on board by row, col
         self.board_size = Cons.SIZE  # Size of board
-        self.c_size, self.r_size = None, None  # Size of sub squares
+        self.cell_size = Cons.WIDTH  # Width and height of each square
+        self.geometry = None  # Shared index tables for board size
         self.digits = None  # All digits available
         self.hint = False  # True to show possibles
 
@@ -80,18 +84,19 @@ class Board:
         """ Draw playing board """
 
         self.board_size = size
-        self.c_size, self.r_size = Cons.SIZE_DICT[self.board_size]
-        self.digits = Cons.DIGITS[:self.board_size]
-        Tile.board_size = self.board_size
-        Tile.digits = self.digits
-
-        self.content = [["0"] * self.board_size for _ in range(self.board_size)]
-        self.sudoku = [["0"] * self.board_size for _ in range(self.board_size)]
+        self.geometry = qgeometry.get_geometry(self.board_size)
+        self.digits = self.geometry.digits
+        self.cell_size = self.geometry.cell_size
+        Tile.geometry = self.geometry
+
+        self.content = qgrid.Grid(self.board_size)
+        self.sudoku = qgrid.Grid(self.board_size)
+        self.set_start()
         self.tiles = [[None] * self.board_size for _ in range(self.board_size)]
         self.poss_tiles = [[None] * self.board_size for _ in range(self.board_size)]
 
-        board_w = self.board_size * (Cons.WIDTH + Cons.MARGIN) + Cons.MARGIN  # width of playing board
-        board_h = self.board_size * (Cons.HEIGHT + Cons.MARGIN) + Cons.MARGIN  # height of playing board
+        board_w = self.board_size * (self.cell_size + Cons.MARGIN) + Cons.MARGIN  # width of playing board
+        board_h = self.board_size * (self.cell_size + Cons.MARGIN) + Cons.MARGIN  # height of playing board
         board_x = (Cons.WINDOW_SIZE[0] - board_w) / 2  # x-coordinate of scrabble board
         board_y = (Cons.WINDOW_SIZE[1] - board_h) / 2  # y-coordinate of scrabble board
         board = [board_x, board_y, board_w, board_h]  # board rect details
@@ -104,13 +109,13 @@ class Board:
 
         for row in range(self.board_size):
             for col in range(self.board_size):
-                left_adj = Cons.INT_CELLS if col % self.c_size else 0
-                top_adj = Cons.INT_CELLS if row % self.r_size else 0
-                width_adj = Cons.INT_CELLS if col % self.c_size else 0
-                height_adj = Cons.INT_CELLS if row % self.r_size else 0
-                square = QGraphicsRectItem(board[0] + (Cons.MARGIN + Cons.WIDTH) * col +
-                                           Cons.MARGIN - left_adj, board[1] + (Cons.MARGIN + Cons.HEIGHT) * row +
-                                           Cons.MARGIN - top_adj, Cons.WIDTH + width_adj, Cons.HEIGHT + height_adj,
+                left_adj = 0 if self.geometry.col_edge[col] else Cons.INT_CELLS
+                top_adj = 0 if self.geometry.row_edge[row] else Cons.INT_CELLS
+                width_adj, height_adj = left_adj, top_adj
+                square = QGraphicsRectItem(board[0] + (Cons.MARGIN + self.cell_size) * col +
+                                           Cons.MARGIN - left_adj, board[1] + (Cons.MARGIN + self.cell_size) * row +
+                                           Cons.MARGIN - top_adj, self.cell_size + width_adj,
+                                           self.cell_size + height_adj,
                                            parent=self.background_item)
                 self.cells.append(square.rect())
                 setattr(square, 'cell', (row, col))
@@ -125,32 +130,32 @@ class Board:
     def set_digits(self):
         """ Draw side number tiles """
 
-        for i in range(0, 12):
-            if i <= self.board_size - 1:
-                xpos = Cons.RACK_XTILE[0]
-                ypos = Cons.RACK_YTILE + i * 55 + (12 - self.board_size) * 55 // 2
-                box = QLabel()
-                box.setGeometry(xpos, ypos, Cons.TILE_WIDTH, Cons.TILE_HEIGHT)
-                box.setStyleSheet("border: 2px solid black")
-                box.setAlignment(Qt.AlignCenter)
-                proxy = QGraphicsProxyWidget()
-                proxy.persistent = False
-                proxy.setWidget(box)
-                proxy.digit = Cons.DIGITS[i]
-                proxy.setPos(xpos, ypos)
-                self.scene.addItem(proxy)
-                proxy.show()
-                tile = Tile(self.digits[i], self.scene)
-                tile.cell = "new"
-                tile.draw_tile(QPoint(xpos, ypos))
+        step = self.cell_size + Cons.MARGIN  # Space taken by each tile
+        for i in range(self.board_size):
+            xpos = Cons.RACK_XTILE[0]
+            ypos = Cons.RACK_YTILE + i * step + (12 * 55 - self.board_size * step) // 2
+            box = QLabel()
+            box.setGeometry(xpos, ypos, self.cell_size, self.cell_size)
+            box.setStyleSheet("border: 2px solid black")
+            box.setAlignment(Qt.AlignCenter)
+            proxy = QGraphicsProxyWidget()
+            proxy.persistent = False
+            proxy.setWidget(box)
+            proxy.digit = Cons.DIGITS[i]
+            proxy.setPos(xpos, ypos)
+            self.scene.addItem(proxy)
+            proxy.show()
+            tile = Tile(self.digits[i], self.scene)
+            tile.cell = "new"
+            tile.draw_tile(QPoint(xpos, ypos))
 
     def load_board(self):
         """ Load new board """
         for row in range(self.board_size):
             for col in range(self.board_size):
-                num = self.content[row][col]
-                if num != "0":
-                    if self.sudoku[row][col] != "0":
+                if not self.content.is_blank(row, col):
+                    num = self.content.char(row, col)
+                    if not self.sudoku.is_blank(row, col):
                         lliw = "black"
                     else:
                         lliw = "red"
@@ -165,29 +170,34 @@ class Board:
 
     def set_sudoku(self):
         """ Copy working board into original board """
-        for row in range(self.board_size):
-            for col in range(self.board_size):
-                self.sudoku[row][col] = self.content[row][col]
+        self.sudoku = self.content.copy()
+        self.set_start()
+
+    def set_start(self):
+        """ Take snapshot of content to go back to on restart """
+        if self.start is not None:
+            self.start.release()
+        self.start = self.content.snapshot()
 
     def freeze_sudoku(self):
         """ Set all initial tiles """
         for row in range(self.board_size):
             for col in range(self.board_size):
-                if self.sudoku[row][col] != "0":
+                if not self.sudoku.is_blank(row, col):
                     self.set_in_board(self.tiles[row][col])
 
     def free_sudoku(self):
         """ Free all initial tiles """
         for row in range(self.board_size):
             for col in range(self.board_size):
-                if self.sudoku[row][col] != "0":
+                if not self.sudoku.is_blank(row, col):
                     self.free_in_board(self.tiles[row][col])
 
     def free_user_tiles(self):
         """ Free all initial tiles """
         for row in range(self.board_size):
             for col in range(self.board_size):
-                if self.sudoku[row][col] == "0" and self.content[row][col] != "0":
+                if self.sudoku.is_blank(row, col) and not self.content.is_blank(row, col):
                     self.free_in_board(self.tiles[row][col])
 
     def set_num(self, num, row, col):
@@ -200,10 +210,15 @@ class Board:
         self.tiles[row][col] = teil
         teil.draw_tile(QPoint(cell.x(), cell.y()))
 
+    def set_numbers(self, placements):
+        """ Set red numbered tiles for solver placements [(row, col, num)] """
+        for row, col, num in placements:
+            self.set_num(num, row, col)
+
     def get_board_size(self):
         """ Return dimensions of board
             board size, square size """
-        return self.board_size, self.r_size, self.c_size
+        return self.board_size, self.geometry.r_size, self.geometry.c_size
 
     def get_rc(self, rectf):
         """ Convert rectangle to row/col """
@@ -217,7 +232,7 @@ class Board:
         """ Returns True if tile can be used by user in game
             Returns pos on board if cell on board """
         cell = next(((row, col.index(teil)) for row, col in enumerate(self.tiles) if teil in col), True)
-        if isinstance(cell, tuple) and self.sudoku[cell[0]][cell[1]] != "0":
+        if isinstance(cell, tuple) and not self.sudoku.is_blank(cell[0], cell[1]):
             cell = False
         return cell
 
@@ -229,14 +244,13 @@ class Board:
         self.set_digits()
 
     def clear_board(self):
-        """ Clear all tiles from board """
-        for row in range(self.board_size):
-            for col in range(self.board_size):
-                if self.sudoku[row][col] == "0" and self.content[row][col] != "0":
-                    self.tiles[row][col].remove()
-                    self.tiles[row][col] = None
-                    self.content[row][col] = "0"
-                self.remove_poss_tile(row, col)
+        """ Clear all tiles placed since the start snapshot from board """
+        for row, col in self.start.changed():
+            if self.tiles[row][col] is not None:
+                self.tiles[row][col].remove()
+                self.tiles[row][col] = None
+        self.content.restore(self.start)
+        self.remove_poss_tiles()
         self.hint = False
 
     def clear_board_area(self):
@@ -246,8 +260,9 @@ class Board:
         for item in self.scene.items():
             if hasattr(item, 'tile') or hasattr(item, 'persistent'):
                 self.scene.removeItem(item)
-        self.content = [["0"] * self.board_size for _ in range(self.board_size)]
-        self.sudoku = [["0"] * self.board_size for _ in range(self.board_size)]
+        self.content = qgrid.Grid(self.board_size)
+        self.sudoku = qgrid.Grid(self.board_size)
+        self.set_start()
         self.tiles = [[None] * self.board_size for _ in range(self.board_size)]
         self.poss_tiles = [[None] * self.board_size for _ in range(self.board_size)]
         self.hint = False
@@ -259,15 +274,15 @@ class Board:
         if isinstance(cell, tuple):
             row, col = cell[0], cell[1]
             teil.cell = None
-            self.content[row][col] = "0"
+            self.content.set(row, col, qgrid.BLANK)
             self.tiles[row][col] = None
 
     def drop_tile(self, teil, row, col):
         """ Set tile on board """
-        self.content[row][col] = teil.letter
+        self.content.set_char(row, col, teil.letter)
         self.tiles[row][col] = teil
         if self.hint:
-            self.states.solver.redo_possibles()
+            self.states.redo_possibles()
 
     def show_poss_tile(self, poss, row, col):
         """ Show possible values on board
@@ -284,6 +299,12 @@ class Board:
             self.poss_tiles[row][col].remove()
             self.poss_tiles[row][col] = None
 
+    def remove_poss_tiles(self):
+        """ Remove possible values from all cells """
+        for row in range(self.board_size):
+            for col in range(self.board_size):
+                self.remove_poss_tile(row, col)
+
     @staticmethod
     def set_in_board(tile):
         """ Set tile in board
@@ -311,8 +332,7 @@ class Tile(Pixmap):
     """ Tile class defines on screen tiles """
 
     anim_complete = pyqtSignal()  # Signal for completion of animation
-    board_size = Cons.SIZE  # Board size set by draw_board()
-    digits = Cons.DIGITS  # Digits in use set by draw_board()
+    geometry = qgeometry.get_geometry(Cons.SIZE)  # Geometry of board set by draw_board()
 
     def __init__(self, letter, scene, lliw="black"):
 
@@ -340,7 +360,8 @@ class Tile(Pixmap):
         if isinstance(lett, list):
             new_data = self.set_hint(lett)
         else:
-            new_data = bytearray(Cons.SVG_DATA_1.format(one=lett, col=lliw), 'utf-8')
+            new_data = bytearray(Cons.SVG_DATA_1.format(one=lett, col=lliw,
+                                                        size=type(self).geometry.cell_size), 'utf-8')
         return QImage.fromData(new_data, 'SVG')
 
     def set_colour(self, lliw):
@@ -395,39 +416,66 @@ class Tile(Pixmap):
 
     def set_hint(self, lett):
         """ Draw all possible letters on tile """
-        num = list(type(self).digits)
+        num = list(type(self).geometry.digits)
         vals = [x if x in lett else "" for x in num]
         return self.create_svg(vals)
 
     def create_svg(self, letts):
         """ Create SVG for tile and return as byte array """
-        c_size, r_size = Cons.SIZE_DICT[type(self).board_size]
-        cell_w, cell_h = Cons.WIDTH, Cons.HEIGHT
-        x_pos = [0]  # x coordinates of grid lines
-        y_pos = []  # y coordinates of grid lines
-        b_array = bytearray(Cons.SVG_HINT_1, 'utf-8')
-
-        # Draw grid lines and store coordinates in above
-        for line in range(1, c_size):
-            start_x = line * cell_w // c_size
-            x_pos.append(start_x)
+        geometry = type(self).geometry
+        cell_w, cell_h = Cons.WIDTH, Cons.HEIGHT  # Tile drawn in these units, scaled to cell_size
+        x_lines, y_lines = geometry.hint_lines(cell_w, cell_h)
+        x_pos = (0,) + x_lines  # x coordinates of left of each section
+        y_pos = y_lines + (cell_h,)  # y coordinates of bottom of each section
+        font = Cons.HINT_FONT.get(geometry.board_size, 12)
+        b_array = bytearray(Cons.SVG_HINT_1.format(size=geometry.cell_size), 'utf-8')
+
+        # Draw grid lines
+        for start_x in x_lines:
             b_array += bytearray(Cons.SVG_HINT_2.format(start_x=start_x, start_y=0, end_x=start_x, end_y=cell_h),
                                  'utf-8')
-        for line in range(1, r_size):
-            start_y = line * cell_h // r_size
-            y_pos.append(start_y)
+        for start_y in y_lines:
             b_array += bytearray(Cons.SVG_HINT_2.format(start_x=0, start_y=start_y, end_x=cell_w, end_y=start_y),
                                  'utf-8')
-        y_pos.append(cell_h)
         mid_x, mid_y = x_pos[1] // 2, y_pos[0] // 2  # Centre of each section
 
         # Draw digit in ection if it is a possibility for that tile
         no = 0
         for num in letts:
-            row, col = no // c_size, no % c_size
+            row, col = divmod(no, geometry.c_size)
             x, y = x_pos[col] + mid_x, y_pos[row] - (mid_y // 2)
-            b_array += bytearray(Cons.SVG_HINT_3.format(x=x, y=y, num=num),
+            b_array += bytearray(Cons.SVG_HINT_3.format(x=x, y=y, num=num, font=font),
                                  'utf-8')
             no += 1
         b_array += bytearray("</svg>", 'utf-8')
         return b_array
+
+
+class Msg(QLabel):
+    """ Class defines showing of messages """
+
+    def __init__(self, scene, parent=None):
+        super(Msg, self).__init__(parent)
+
+        self.scene = scene
+        self.setLineWidth(5)
+        self.setMidLineWidth(5)
+        self.setStyleSheet("background-color:rgb(230, 200, 167); color : black;")
+        self.move(Cons.INSTR_RECT[0], Cons.INSTR_RECT[1])
+        self.resize(Cons.INSTR_RECT[2], Cons.INSTR_RECT[3])
+        self.setFont(QFont("Arial", 18))
+        self.setAlignment(Qt.AlignCenter)
+        self.setWordWrap(True)
+        self.setTextFormat(Qt.PlainText)
+        self.proxy = self.scene.addWidget(self)
+
+    def show_msg(self, text):
+        """ Show message """
+
+        self.setText(text)
+        self.show()
+
+    def clear_msg(self):
+        """ Clear message """
+
+        self.clear()
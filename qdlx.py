@@ -0,0 +1,212 @@
+""" Exact cover solver using Dancing Links (Knuth's Algorithm X)
+    Each choice of digit in a cell is a row covering four columns:
+    the cell, the digit in its row, the digit in its column and the digit in its square
+    Works on qgrid.Grid boards """
+
+import threading
+
+import qbits
+import qgeometry
+import qgrid
+
+_tables = dict()  # Cache of cover tables by board size
+_matrices = dict()  # Cache of linked matrices by board size
+_lock = threading.Lock()  # Held while a cover table or matrix is built
+
+
+def get_table(size):
+    """ Return tuple of columns covered by each choice for board of size, building it on first use
+        Choice number (row * size + col) * size + digit index """
+    table = _tables.get(size)
+    if table is None:
+        with _lock:
+            table = _tables.get(size)
+            if table is None:
+                geometry = qgeometry.get_geometry(size)
+                cells = size * size
+                table = tuple((row * size + col,
+                               cells + row * size + i,
+                               2 * cells + col * size + i,
+                               3 * cells + geometry.square_of[row][col] * size + i)
+                              for row, col in geometry.cells for i in range(size))
+                _tables[size] = table
+    return table
+
+
+def get_matrix(size):
+    """ Return fully linked matrix of every choice for an empty board of size, building it on first use
+        As tuples (left, right, up, down, column, rows in each column, choice of each node)
+        Header 0 is the root, header column + 1 for each column, then four nodes for each choice """
+    matrix = _matrices.get(size)
+    if matrix is None:
+        table = get_table(size)
+        with _lock:
+            matrix = _matrices.get(size)
+            if matrix is None:
+                matrix = _link(table, size)
+                _matrices[size] = matrix
+    return matrix
+
+
+def _link(table, size):
+    """ Return matrix for get_matrix() linking every choice in table """
+    count = 4 * size * size + 1  # Headers
+    total = count + 4 * len(table)
+    left = [n - 1 for n in range(count)]
+    right = [n + 1 for n in range(count)]
+    left[0], right[-1] = count - 1, 0
+    # Four nodes for each choice, linked left and right in a ring
+    left += [node + 3 if (node - count) % 4 == 0 else node - 1 for node in range(count, total)]
+    right += [node - 3 if (node - count) % 4 == 3 else node + 1 for node in range(count, total)]
+    column = list(range(count)) + [column + 1 for columns in table for column in columns]
+    choice = [None] * count + [(number % size, number // size // size, number // size % size)
+                               for number in range(len(table)) for _ in range(4)]
+    # Link nodes of each column up and down in a ring through its header
+    up, down = [0] * total, [0] * total
+    column_nodes = [[header] for header in range(count)]
+    for node in range(count, total):
+        column_nodes[column[node]].append(node)
+    for nodes in column_nodes:
+        for n, node in enumerate(nodes):
+            down[node] = nodes[(n + 1) % len(nodes)]
+            up[node] = nodes[n - 1]
+    rows = [len(nodes) - 1 for nodes in column_nodes]
+    return tuple(left), tuple(right), tuple(up), tuple(down), tuple(column), tuple(rows), tuple(choice)
+
+
+class DancingLinks:
+    """ Exact cover matrix for the blank cells of a grid
+        Starts from a copy of the linked matrix for the board size with the choices of the numbers set taken """
+
+    def __init__(self, grid, possibles=None, stop=None):
+        """ grid: qgrid.Grid, not changed
+            possibles: optional masks of digits allowed in each cell, as Solver.possibles
+            stop: optional function of nodes searched, search gives up when it returns True """
+
+        self.board_size = size = grid.size
+        self.nodes = 0  # Columns chosen during search
+        self.stop = stop
+        self.valid = True  # False if numbers set clash
+        left, right, up, down, self.column, rows, self.choice = get_matrix(size)
+        self.left, self.right, self.up, self.down, self.size = (list(left), list(right), list(up), list(down),
+                                                                list(rows))
+        table = get_table(size)
+        count = 4 * size * size + 1
+        cells = grid.cells
+
+        # Take the choice of each number set by covering its columns
+        covered = bytearray(count)
+        for cell in range(size * size):
+            code = cells[cell]
+            if code != qgrid.BLANK:
+                for column in table[cell * size + code - 1]:
+                    if covered[column + 1]:
+                        self.valid = False  # Numbers set clash
+                        return
+                    covered[column + 1] = 1
+                    self.cover(column + 1)
+        if possibles is None:
+            return
+        # Drop choices of digits not possible that are still in the matrix
+        geometry = qgeometry.get_geometry(size)
+        for row, col in geometry.cells:
+            cell = row * size + col
+            if cells[cell] != qgrid.BLANK:
+                continue
+            for i in qbits.BIT_LIST[qbits.full_mask(size) & ~possibles[row][col]]:
+                node = count + 4 * (cell * size + i)
+                if any(covered[self.column[j]] for j in range(node, node + 4)):
+                    continue  # Already gone with a number set
+                self.remove_row(node)
+
+    def remove_row(self, node):
+        """ Unlink the nodes of the row holding node from their columns for good """
+        up, down, column, size = self.up, self.down, self.column, self.size
+        j = node
+        while True:
+            down[up[j]] = down[j]
+            up[down[j]] = up[j]
+            size[column[j]] -= 1
+            j = self.right[j]
+            if j == node:
+                break
+
+    def cover(self, header):
+        """ Remove column and all rows using it """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, header):
+        """ Put back column removed by cover() """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def solutions(self, limit=None):
+        """ Generate solutions, each a list of (digit index, row, col) for the blank cells
+            Stops after limit solutions if given """
+        if not self.valid or limit == 0:
+            return
+        found = 0
+        for solution in self.search([]):
+            yield [self.choice[node] for node in solution]
+            found += 1
+            if found == limit:
+                return
+
+    def count(self, limit=None):
+        """ Return number of solutions, counting no further than limit if given """
+        return sum(1 for _ in self.solutions(limit))
+
+    def search(self, chosen):
+        """ Generate lists of nodes chosen for each solution, covering the column with fewest rows first """
+        right, down, size = self.right, self.down, self.size
+        if right[0] == 0:
+            yield chosen
+            return
+        header, best = 0, None
+        n = right[0]
+        while n:
+            if best is None or size[n] < best:
+                header, best = n, size[n]
+                if best < 2:
+                    break
+            n = right[n]
+        if best == 0 or self.stop is not None and self.stop(self.nodes):
+            return
+        self.nodes += 1
+        self.cover(header)
+        node = down[header]
+        while node != header:
+            chosen.append(node)
+            j = right[node]
+            while j != node:
+                self.cover(self.column[j])
+                j = right[j]
+            yield from self.search(chosen)
+            j = self.left[node]
+            while j != node:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            chosen.pop()
+            node = down[node]
+        self.uncover(header)
@@ -87,7 +87,7 @@ class GraphicsScene(QGraphicsScene):
         row, col = -1, -1
         cells = [(r.rect(), r.cell) for r in collisions if isinstance(r, QGraphicsRectItem) and hasattr(r, 'cell')]
         rects = [[r.x(), r.y(), r.width(), r.height()] for (r, w) in cells]
-        tilerect = [self.item.x(), self.item.y(), Cons.WIDTH, Cons.HEIGHT]
+        tilerect = [self.item.x(), self.item.y(), self.board.cell_size, self.board.cell_size]
         overlaps = [self.overlap(tilerect, r) for r in rects]
         if overlaps:
             index = max(range(len(overlaps)), key=overlaps.__getitem__)
@@ -103,9 +103,8 @@ class GraphicsScene(QGraphicsScene):
             distances is list of Manhatton distance from empty cell to present cell
             set row, col to first empty cell nearest present cell """
 
-        if self.board.content[row][col] != "0":
-            empty_cells = [(x, y) for x, nos in enumerate(self.board.content) for y in
-                           [c for c, no in enumerate(nos) if no == "0"]]
+        if not self.board.content.is_blank(row, col):
+            empty_cells = self.board.content.blanks()
             distances = [abs(row - r) + abs(col - c) for (r, c) in empty_cells]
             row, col = empty_cells[distances.index(min(distances))]
         return row, col
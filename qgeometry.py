@@ -0,0 +1,152 @@
+""" Index tables describing the geometry of a board
+    Built once for each board size and shared by solver, board and states """
+
+import threading
+
+import Constants as Cons
+
+MAX_POS_TABLE = 12  # Largest board whose position tables are built in full
+
+_geometries = dict()  # Cache of Geometry objects by board size
+_lock = threading.Lock()  # Held while a geometry is built
+
+
+def get_geometry(size):
+    """ Return geometry for board of size, building it on first use
+        Safe to call from several threads, each size is only built once """
+    geometry = _geometries.get(size)
+    if geometry is None:
+        with _lock:
+            geometry = _geometries.get(size)
+            if geometry is None:
+                geometry = Geometry(size)
+                _geometries[size] = geometry
+    return geometry
+
+
+class Geometry:
+    """ Rows, columns, squares and peers of every cell for one board size
+        Cells are (row, col) tuples, squares numbered left to right, top to bottom
+        Squares are c_size columns wide and r_size rows high
+        All tables are tuples and attributes cannot be changed once built """
+
+    def __init__(self, size):
+
+        self.board_size = size
+        self.c_size, self.r_size = Cons.SIZE_DICT[size]  # Columns and rows in each square
+        self.digits = Cons.DIGITS[:size]
+        self.squares_across = size // self.c_size  # Squares in each band
+        self.squares_down = size // self.r_size  # Squares in each stack
+
+        self.cells = tuple((row, col) for row in range(size) for col in range(size))
+        self.rows = tuple(tuple((row, col) for col in range(size)) for row in range(size))
+        self.cols = tuple(tuple((row, col) for row in range(size)) for col in range(size))
+        self.squares = tuple(tuple((row, col) for row, col in self.cells if self.square_index(row, col) == index)
+                             for index in range(size))
+        # All units as one tuple: rows, then columns, then squares
+        self.units = self.rows + self.cols + self.squares
+
+        # square_of[row][col]: index of square containing cell
+        self.square_of = tuple(tuple(self.square_index(row, col) for col in range(size)) for row in range(size))
+        # peers[row][col]: all other cells sharing a row, column or square with cell
+        self.peers = tuple(tuple(self.get_peers(row, col) for col in range(size)) for row in range(size))
+        # peer_sets[row][col]: peers as a frozenset for intersecting
+        self.peer_sets = tuple(tuple(frozenset(peers) for peers in row) for row in self.peers)
+        # cell_units[row][col]: (unit index, position of cell in unit) for its row, column and square
+        self.cell_units = tuple(tuple(((row, col),
+                                       (size + col, row),
+                                       (2 * size + self.square_of[row][col],
+                                        self.squares[self.square_of[row][col]].index((row, col))))
+                                      for col in range(size)) for row in range(size))
+
+        # Rows and columns spanned by each square
+        self.square_rows = tuple(tuple(sorted(set(row for row, _ in squ))) for squ in self.squares)
+        self.square_cols = tuple(tuple(sorted(set(col for _, col in squ))) for squ in self.squares)
+        # Masks of positions in a square for each row and column within it
+        self.square_row_masks = tuple(((1 << self.c_size) - 1) << (row * self.c_size) for row in range(self.r_size))
+        self.square_col_masks = tuple(sum(1 << (col + row * self.c_size) for row in range(self.r_size))
+                                      for col in range(self.c_size))
+        # Rows and columns within a square holding any of a mask of positions, as masks of row/col offsets
+        self.square_pos_rows, self.square_pos_cols = self.get_pos_lines()
+        # Masks of positions in a row taken by each square (its columns)
+        # and of positions in a column taken by each square (its rows)
+        self.square_col_bits = tuple(sum(1 << col for col in cols) for cols in self.square_cols)
+        self.square_row_bits = tuple(sum(1 << row for row in rows) for rows in self.square_rows)
+        # Squares crossed by each row and column
+        self.row_squares = tuple(tuple(index for index in range(size) if row in self.square_rows[index])
+                                 for row in range(size))
+        self.col_squares = tuple(tuple(index for index in range(size) if col in self.square_cols[index])
+                                 for col in range(size))
+        # Squares sharing the same rows (bands) and the same columns (stacks)
+        self.bands = tuple(tuple(range(band * self.squares_across, (band + 1) * self.squares_across))
+                           for band in range(self.squares_down))
+        self.stacks = tuple(tuple(range(stack, size, self.squares_across))
+                            for stack in range(self.squares_across))
+
+        # Drawing: size of each cell on screen and rows/columns starting a square, their edges drawn bold
+        self.cell_size = Cons.CELL_SIZE.get(size, Cons.WIDTH)
+        self.row_edge = tuple(row % self.r_size == 0 for row in range(size))
+        self.col_edge = tuple(col % self.c_size == 0 for col in range(size))
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("Geometry for size {} cannot be changed".format(self.board_size))
+        super().__setattr__(name, value)
+
+    def square_index(self, row, col):
+        """ Return index of square containing (row, col) """
+        return row // self.r_size * self.squares_across + col // self.c_size
+
+    def get_pos_lines(self):
+        """ Return tables of row and column offsets in a square for every mask of positions
+            Boards with large squares fill them in as each mask is first used """
+        if self.board_size > MAX_POS_TABLE:
+            return _LineTable(self.square_row_masks), _LineTable(self.square_col_masks)
+        rows, cols = [0] * (1 << self.board_size), [0] * (1 << self.board_size)
+        for mask in range(1, 1 << self.board_size):
+            pos = (mask & -mask).bit_length() - 1
+            rows[mask] = rows[mask & (mask - 1)] | 1 << (pos // self.c_size)
+            cols[mask] = cols[mask & (mask - 1)] | 1 << (pos % self.c_size)
+        return tuple(rows), tuple(cols)
+
+    def grid_lines(self, cell, margin=0):
+        """ Return positions of lines between cells cell wide in a grid starting at margin
+            as ((bold, light) vertical lines, (bold, light) horizontal lines), bold on edges of squares """
+        lines = []
+        for edge in (self.col_edge, self.row_edge):
+            lines.append((tuple(margin + line * cell for line in range(1, self.board_size) if edge[line]),
+                          tuple(margin + line * cell for line in range(1, self.board_size) if not edge[line])))
+        return tuple(lines)
+
+    def hint_lines(self, width, height):
+        """ Return positions of lines splitting a tile into a section for each digit,
+            c_size sections across and r_size down like a square, as (x positions, y positions) """
+        return (tuple(line * width // self.c_size for line in range(1, self.c_size)),
+                tuple(line * height // self.r_size for line in range(1, self.r_size)))
+
+    def get_peers(self, row, col):
+        """ Return tuple of cells sharing a unit with (row, col) """
+        index = self.square_index(row, col)
+        peers = set(self.rows[row]) | set(self.cols[col]) | set(self.squares[index])
+        peers.discard((row, col))
+        return tuple(sorted(peers))
+
+
+class _LineTable(dict):
+    """ Lines within a square holding any of a mask of positions, as a mask of line offsets
+        Worked out from the position masks of each line on first use of a mask
+        Threads filling in the same mask store the same value, so the table can be shared """
+
+    def __init__(self, line_masks):
+
+        super().__init__()
+        self.line_masks = line_masks  # Mask of positions in each line
+
+    def __missing__(self, mask):
+        lines = 0
+        for line, line_mask in enumerate(self.line_masks):
+            if mask & line_mask:
+                lines |= 1 << line
+        self[mask] = lines
+        return lines
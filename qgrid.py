@@ -0,0 +1,159 @@
+""" Compact board of digits used for content, sudoku and solving
+    One byte for each cell by cell number row * size + col, 0 for blank and i + 1 for digit Cons.DIGITS[i]
+    Digit characters are only made when a board is read, written or drawn
+    Snapshots keep earlier versions of a grid by saving only the cells changed since """
+
+import Constants as Cons
+
+BLANK = 0
+
+_CODES = {char: code for code, char in enumerate(Cons.DIGITS, 1)}  # {digit character: code}
+# Byte translation tables between digit characters and codes, other characters are blank
+_TO_CODE = bytearray(256)
+for _char, _code in _CODES.items():
+    _TO_CODE[ord(_char)] = _code
+_TO_CHAR = bytearray(b"0" * 256)
+_TO_CHAR[1:len(Cons.DIGITS) + 1] = Cons.DIGITS.encode("ascii")
+
+
+def code_of(char):
+    """ Return code of digit character, BLANK for '0', '.' or anything else """
+    return _CODES.get(char, BLANK)
+
+
+class Grid:
+    """ Digits on a board with a running count of filled cells
+        Change cells with set() so the count and snapshots stay right """
+
+    __slots__ = ("size", "cells", "filled", "snapshots")
+
+    def __init__(self, size, cells=None):
+        """ size: cells on each side
+            cells: optional bytes of codes by cell number """
+
+        self.size = size
+        self.cells = bytearray(size * size) if cells is None else bytearray(cells)
+        self.filled = len(self.cells) - self.cells.count(BLANK)  # Cells not blank
+        self.snapshots = []  # Snapshots still saving cells before they change
+
+    @classmethod
+    def from_text(cls, text, size=None):
+        """ Return grid from string of digit characters row by row, '0' or '.' for blank
+            Size is worked out from length of text if not given """
+        if size is None:
+            size = int(round(len(text) ** 0.5))
+        if len(text) != size * size:
+            raise ValueError("{} characters for board of size {}".format(len(text), size))
+        return cls(size, text.encode("ascii", "replace").translate(_TO_CODE))
+
+    def __eq__(self, other):
+        return isinstance(other, Grid) and self.cells == other.cells
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Grid({}, {!r})".format(self.size, self.text())
+
+    def copy(self):
+        """ Return independent copy of grid without its snapshots """
+        grid = Grid.__new__(Grid)
+        grid.size, grid.cells, grid.filled, grid.snapshots = self.size, bytearray(self.cells), self.filled, []
+        return grid
+
+    def get(self, row, col):
+        """ Return code in (row, col) """
+        return self.cells[row * self.size + col]
+
+    def set(self, row, col, code):
+        """ Put code in (row, col), BLANK to clear it """
+        cell = row * self.size + col
+        old = self.cells[cell]
+        for snapshot in self.snapshots:
+            if cell not in snapshot.saved:
+                snapshot.saved[cell] = old
+        self.filled += (code != BLANK) - (old != BLANK)
+        self.cells[cell] = code
+
+    def char(self, row, col):
+        """ Return digit character in (row, col), '0' if blank """
+        return chr(_TO_CHAR[self.cells[row * self.size + col]])
+
+    def set_char(self, row, col, char):
+        """ Put digit character in (row, col), '0' to clear it """
+        self.set(row, col, code_of(char))
+
+    def is_blank(self, row, col):
+        """ Return True if (row, col) is blank """
+        return self.cells[row * self.size + col] == BLANK
+
+    def is_empty(self):
+        """ Return True if every cell is blank """
+        return self.filled == 0
+
+    def is_full(self):
+        """ Return True if every cell is filled """
+        return self.filled == len(self.cells)
+
+    def blanks(self):
+        """ Return list of (row, col) of blank cells """
+        cells, size = self.cells, self.size
+        return [divmod(cell, size) for cell in range(len(cells)) if cells[cell] == BLANK]
+
+    def text(self, blank="0"):
+        """ Return digits as one string row by row with blank for each blank cell """
+        text = self.cells.translate(_TO_CHAR).decode("ascii")
+        return text if blank == "0" else text.replace("0", blank)
+
+    def rows(self):
+        """ Return list of rows of digit characters, '0' for blank """
+        text, size = self.text(), self.size
+        return [list(text[row * size:(row + 1) * size]) for row in range(size)]
+
+    def update(self, other):
+        """ Set every cell that differs from grid other of the same size """
+        cells, size = other.cells, self.size
+        for cell in range(len(cells)):
+            if self.cells[cell] != cells[cell]:
+                self.set(cell // size, cell % size, cells[cell])
+
+    # -------------------------------------------------------------------------
+    # Snapshots
+
+    def snapshot(self):
+        """ Return Snapshot of grid as it is now
+            Nothing is copied until cells change """
+        snapshot = Snapshot(self)
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def restore(self, snapshot):
+        """ Put back cells changed since snapshot was taken
+            Snapshot stays in use and matches the grid again """
+        saved, snapshot.saved = snapshot.saved, dict()
+        size = self.size
+        for cell, code in saved.items():
+            self.set(cell // size, cell % size, code)
+        snapshot.saved.clear()
+
+
+class Snapshot:
+    """ Earlier version of a grid sharing all cells not changed since
+        Holds the old code of each cell the grid changes, saved when first changed """
+
+    __slots__ = ("grid", "saved")
+
+    def __init__(self, grid):
+
+        self.grid = grid
+        self.saved = dict()  # {cell number: code when snapshot was taken}
+
+    def changed(self):
+        """ Return list of (row, col) whose codes differ from the grid now """
+        cells, size = self.grid.cells, self.grid.size
+        return [divmod(cell, size) for cell, code in self.saved.items() if cells[cell] != code]
+
+    def release(self):
+        """ Stop saving cells, snapshot must not be used after """
+        if self in self.grid.snapshots:
+            self.grid.snapshots.remove(self)
+        self.saved.clear()
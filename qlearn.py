@@ -0,0 +1,269 @@
+""" Search with conflict-directed backjumping and nogood learning
+    Each contradiction is traced back through the singles that caused it to the choices made
+    The search jumps back to the latest choice involved and keeps the set of choices as a nogood
+    Choices are (digit index, row, col) as given by Solver.fewest_tries() """
+
+import collections
+
+import qbits
+
+MAX_NOGOODS = 2000  # Nogoods kept, least recently used dropped first
+MAX_NOGOOD_SIZE = 12  # Larger nogoods are rarely matched and are not kept
+
+
+class NogoodStore:
+    """ Bounded store of sets of choices that cannot all hold together """
+
+    def __init__(self, limit=MAX_NOGOODS):
+
+        self.limit = limit
+        # {nogood: ((row, col, code) of each choice)}, least recently used first
+        self.nogoods = collections.OrderedDict()
+        self.watch = dict()  # {choice: set of nogoods containing it}
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, nogood):
+        """ Keep nogood, dropping the least recently used if the store is full """
+        nogood = frozenset(nogood)
+        if not nogood or len(nogood) > MAX_NOGOOD_SIZE:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        if len(self.nogoods) >= self.limit:
+            self.remove(next(iter(self.nogoods)))
+        self.nogoods[nogood] = tuple((row, col, num + 1) for num, row, col in nogood)
+        for choice in nogood:
+            self.watch.setdefault(choice, set()).add(nogood)
+
+    def remove(self, nogood):
+        """ Drop nogood from store """
+        del self.nogoods[nogood]
+        for choice in nogood:
+            watched = self.watch[choice]
+            watched.discard(nogood)
+            if not watched:
+                del self.watch[choice]
+
+    def find(self, choice, content):
+        """ Return a nogood holding choice whose other choices are all set in content, a qgrid.Grid, or None """
+        _, c_row, c_col = choice
+        cells, size = content.cells, content.size
+        for nogood in self.watch.get(choice, ()):
+            if all(cells[row * size + col] == code for row, col, code in self.nogoods[nogood]
+                   if row != c_row or col != c_col):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+
+class LearningSearch:
+    """ Fill the blank cells of a Solver by backjumping search
+        Uses the solver's trail, singles and choice of tries """
+
+    def __init__(self, solver, store=None):
+
+        self.solver = solver
+        self.store = NogoodStore() if store is None else store
+        self.nodes = 0  # Choices tried
+        self.root_possibles = None  # Possibles when the search started
+        self.root_placed = 0  # Numbers set before the search started
+        self.decisions = set()  # Choices on current path
+        # Numbers set since the search started, kept up to date with the solver's placements
+        self.cells = dict()  # {(row, col): (order, num)}
+        self.units = dict()  # {(unit, num): (order, (row, col))} for the first placed in unit
+        self.synced = 0  # Placements after root_placed in cells and units
+        self.reasons = dict()  # {(row, col): causes()} for cells still placed
+
+    def search(self):
+        """ Fill blank cells
+            Returns True when board is complete, otherwise board is left unchanged """
+        solver = self.solver
+        mark = solver.checkpoint()
+        solver.touched = set(range(3 * solver.board_size))
+        if solver.follow_singles() is None:
+            self.root_possibles = [row[:] for row in solver.possibles]
+            self.root_placed = len(solver.placements)
+            if self.search_level() is None:
+                return True
+        solver.undo(mark)
+        return False
+
+    def search_level(self):
+        """ Try each of solver.fewest_tries() in turn and search on from there
+            Returns None when board is complete, otherwise set of choices causing the failure
+            Returns at once if the current try is not in that set, so earlier tries are skipped """
+        solver = self.solver
+        if solver.is_complete():
+            return None
+        tries = solver.fewest_tries()
+        conflict = self.explain_tries(tries)
+        mark = solver.checkpoint()
+        for choice in tries:
+            if solver.stopped(self.nodes):
+                return set(self.decisions)  # Give up, search() undoes the board
+            num, row, col = choice
+            nogood = self.store.find(choice, solver.content)
+            if nogood is not None:
+                placed = self.placed()
+                found = self.decided([(r, c) for _, r, c in nogood if (r, c) != (row, col) and (r, c) in placed],
+                                     placed)
+                found.add(choice)
+            else:
+                self.nodes += 1
+                self.decisions.add(choice)
+                solver.touched = set()
+                solver.set_number(num, row, col, "CL")
+                reason = solver.follow_singles()
+                found = self.explain_contradiction(reason) if reason is not None else self.search_level()
+                if found is None:
+                    return None
+                self.forget(mark[1])
+                solver.undo(mark)
+                self.decisions.discard(choice)
+                if not solver.stopped(self.nodes):
+                    self.store.add(found)  # Not a real conflict if the search gave up
+            if choice not in found:
+                return found
+            conflict |= found - {choice}
+        return conflict
+
+    # -------------------------------------------------------------------------
+    # Tracing contradictions back to choices
+
+    def placed(self):
+        """ Return {(row, col): (order, num)} for numbers set since the search started
+            Only placements made since the last call are added """
+        placements, cell_units = self.solver.placements, self.solver.geometry.cell_units
+        for order in range(self.synced, len(placements) - self.root_placed):
+            row, col, num = placements[self.root_placed + order]
+            self.cells.setdefault((row, col), (order, num))
+            for unit, _ in cell_units[row][col]:
+                self.units.setdefault((unit, num), (order, (row, col)))
+        self.synced = len(placements) - self.root_placed
+        return self.cells
+
+    def forget(self, length):
+        """ Drop placements from length on from placed(), called before they are undone """
+        placements, cell_units = self.solver.placements, self.solver.geometry.cell_units
+        for order in range(self.synced - 1, length - self.root_placed - 1, -1):
+            row, col, num = placements[self.root_placed + order]
+            if self.cells.get((row, col)) == (order, num):
+                del self.cells[(row, col)]
+                self.reasons.pop((row, col), None)
+            for unit, _ in cell_units[row][col]:
+                if self.units.get((unit, num), (None,))[0] == order:
+                    del self.units[(unit, num)]
+        self.synced = min(self.synced, length - self.root_placed)
+
+    def absent(self, row, col, bit, order, placed):
+        """ Return cells whose numbers stopped digit bit going in (row, col) before order
+            Empty if it could not go there when the search started, None if nothing found """
+        if not self.root_possibles[row][col] & bit:
+            return ()
+        item = placed.get((row, col))
+        if item is not None and item[0] < order:
+            return ((row, col),)
+        num = qbits.LOW_BIT[bit]
+        for unit, _ in self.solver.geometry.cell_units[row][col]:
+            item = self.units.get((unit, num))
+            if item is not None and item[0] < order:
+                return (item[1],)
+        return None
+
+    def causes(self, cell, placed):
+        """ Return cells whose numbers left only one place for the number in cell
+            as a naked single, or as a hidden single in one of its units
+            None if nothing found
+            Kept until the number is undone, as only earlier numbers are causes """
+        if cell not in self.reasons:
+            self.reasons[cell] = self.find_causes(cell, placed)
+        return self.reasons[cell]
+
+    def find_causes(self, cell, placed):
+        """ Work out causes() of number in cell """
+        solver = self.solver
+        order, num = placed[cell]
+        row, col = cell
+        bit = 1 << num
+        found = []
+        for i in qbits.BIT_LIST[self.root_possibles[row][col] & ~bit]:
+            cause = self.absent(row, col, 1 << i, order, placed)
+            if cause is None:
+                break
+            found.extend(cause)
+        else:
+            return found
+        for unit, _ in solver.geometry.cell_units[row][col]:
+            found = []
+            for other in solver.geometry.units[unit]:
+                if other != cell:
+                    cause = self.absent(other[0], other[1], bit, order, placed)
+                    if cause is None:
+                        break
+                    found.extend(cause)
+            else:
+                return found
+        return None
+
+    def decided(self, cells, placed):
+        """ Return set of choices that led to the numbers in cells """
+        found, seen = set(), set()
+        stack = list(cells)
+        while stack:
+            cell = stack.pop()
+            if cell in seen:
+                continue
+            seen.add(cell)
+            order, num = placed[cell]
+            choice = (num, cell[0], cell[1])
+            if choice in self.decisions:
+                found.add(choice)
+                continue
+            causes = self.causes(cell, placed)
+            if causes is None:
+                return set(self.decisions)
+            stack.extend(causes)
+        return found
+
+    def explain_cells(self, cells):
+        """ Return set of choices that stopped each digit bit in cells [(row, col, bit)] going there """
+        placed = self.placed()
+        found = []
+        for row, col, bit in cells:
+            cause = self.absent(row, col, bit, self.synced, placed)
+            if cause is None:
+                return set(self.decisions)
+            found.extend(cause)
+        return self.decided(found, placed)
+
+    def explain_contradiction(self, reason):
+        """ Return set of choices leading to Contradiction reason """
+        solver = self.solver
+        if reason.kind == reason.NO_POSSIBLES:
+            row, col = reason.cell
+            missing = [(row, col, 1 << i) for i in qbits.BIT_LIST[self.root_possibles[row][col]]]
+        elif reason.kind == reason.NO_PLACE:
+            bit = 1 << solver.digits.index(reason.digit)
+            missing = [(row, col, bit) for row, col in solver.geometry.units[reason.unit]]
+        else:
+            return set(self.decisions)
+        return self.explain_cells(missing)
+
+    def explain_tries(self, tries):
+        """ Return set of choices that left only tries: the other digits of a cell
+            or the other places of a digit in a unit """
+        solver = self.solver
+        num, row, col = tries[0]
+        if all((r, c) == (row, col) for _, r, c in tries):
+            gone = self.root_possibles[row][col] & ~solver.possibles[row][col]
+            return self.explain_cells([(row, col, 1 << i) for i in qbits.BIT_LIST[gone]])
+        cells = set((r, c) for _, r, c in tries)
+        bit = 1 << num
+        for unit, _ in solver.geometry.cell_units[row][col]:
+            if cells.issubset(solver.geometry.units[unit]):
+                return self.explain_cells([(r, c, bit) for r, c in solver.geometry.units[unit]
+                                           if (r, c) not in cells])
+        return set(self.decisions)
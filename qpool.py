@@ -0,0 +1,72 @@
+""" Thread pool answering hint, check and solve requests for boards
+    Each request is given its own copy of the board and its own Solver when it is submitted,
+    so requests run side by side and the board can go on changing while they do
+    Searches give up after qbackends.NODE_LIMITS tries, so no request runs for long
+    Results come back as concurrent.futures.Future objects """
+
+import concurrent.futures
+import threading
+
+import qbackends
+import qsolver
+
+WORKERS = 4  # Threads serving requests
+
+
+def hint(grid):
+    """ Return ({(row, col): list of possible digits} for blank cells, Contradiction or None) """
+    solver = qsolver.Solver()
+    solver.initialize(grid)
+    possibles = dict()
+    for row, col in solver.geometry.cells:
+        poss = solver.get_possibles(row, col)
+        if poss:
+            possibles[(row, col)] = poss
+    return possibles, solver.contradiction
+
+
+def check(grid, sudoku, stop_event=None):
+    """ Return list of (row, col) where grid has a digit not in the solution of sudoku
+        Returns None if sudoku cannot be solved or the search gave up, sudoku is filled in place
+        stop_event: optional threading.Event that makes the search give up once set """
+    solved, _ = qbackends.solve(sudoku, None, qbackends.limit(sudoku), stop_event)
+    if not solved:
+        return None
+    return [(row, col) for row in range(grid.size) for col in range(grid.size)
+            if not grid.is_blank(row, col) and grid.get(row, col) != sudoku.get(row, col)]
+
+
+def solve(grid, name=None, stop_event=None):
+    """ Fill grid in place with backend name, or the one chosen for it
+        Returns grid, or None if it cannot be solved or the search gave up
+        stop_event: optional threading.Event that makes the search give up once set """
+    solved, _ = qbackends.solve(grid, name, qbackends.limit(grid, name), stop_event)
+    return grid if solved else None
+
+
+class SolverPool:
+    """ Runs hint(), check() and solve() in worker threads on copies of the boards given """
+
+    def __init__(self, workers=WORKERS):
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.stopping = threading.Event()  # Set by close() to make running searches give up
+
+    def hint(self, grid):
+        """ Return Future for hint() of copy of grid """
+        return self.executor.submit(hint, grid.copy())
+
+    def check(self, grid, sudoku):
+        """ Return Future for check() of copies of grid and sudoku """
+        return self.executor.submit(check, grid.copy(), sudoku.copy(), self.stopping)
+
+    def solve(self, grid, name=None):
+        """ Return Future for solve() of copy of grid """
+        return self.executor.submit(solve, grid.copy(), name, self.stopping)
+
+    def close(self, wait=True):
+        """ Stop taking requests, waiting for those running to finish if wait
+            Otherwise requests not started are cancelled and running searches give up """
+        if not wait:
+            self.stopping.set()
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -1,63 +1,157 @@
-""" Algorithms for solving square """
+""" Algorithms for solving square
+    Works on qgrid.Grid boards and does not use Qt
+    Numbers set and possibles removed are recorded for the display to apply """
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QLabel
-import itertools
+import qbits
+import qdlx
+import qgeometry
+import qgrid
+import qlearn
+import qtemplates
 
-import Constants as Cons
+MAX_FISH = 4  # Largest fish checked: 2 X-Wing, 3 Swordfish, 4 Jellyfish
+MAX_FORCING = 3  # Most possibles in a cell tried by forcing chains
 
 
-class Solver:
+def count_solutions(grid, limit=2):
+    """ Return number of solutions of grid, counting no further than limit
+        grid: qgrid.Grid, not changed """
+    return qdlx.DancingLinks(grid).count(limit)
 
-    def __init__(self, board):
 
-        self.board = board
-        self.possibles = None
+def is_unique(grid):
+    """ Return True if grid has exactly one solution """
+    return count_solutions(grid, 2) == 1
+
+
+class Contradiction:
+    """ Reason a board cannot be solved """
+
+    DUPLICATE = "duplicate"  # Digit set twice in unit
+    NO_POSSIBLES = "no possibles"  # Blank cell where no digit can go
+    NO_PLACE = "no place"  # Digit neither set nor possible anywhere in unit
+
+    def __init__(self, kind, unit, line, cell=None, digit=None):
+
+        self.kind = kind
+        self.unit = unit  # Index into geometry.units
+        self.line = line  # Unit as text, e.g. "row 3"
+        self.cell = cell  # (row, col) for NO_POSSIBLES
+        self.digit = digit  # Digit character for DUPLICATE and NO_PLACE
+
+    def __str__(self):
+        if self.kind == Contradiction.DUPLICATE:
+            return "{} appears twice in {}".format(self.digit, self.line)
+        if self.kind == Contradiction.NO_POSSIBLES:
+            return "Nothing can go at row {} column {}".format(self.cell[0] + 1, self.cell[1] + 1)
+        return "{} cannot go anywhere in {}".format(self.digit, self.line)
+
+
+class Solver:
+    """ State of one solve: the board, its possibles, the trail of changes and the flags of each stage
+        Tables for the board size are shared and read only, so separate Solvers can run in separate threads
+        One Solver must not be used by two threads at once """
+
+    def __init__(self):
 
         self.content = None
-        self.board_size, self.r_size, self.c_size = None, None, None
+        self.board_size = None
         self.digits = None
+        self.all_digits = 0  # Mask with all digits in use
+        self.geometry = None  # Shared index tables for board size
         self.squares = None
-        self.poss_tiles = None
         self.possibles = None
+        self.places = None
+        self.naked_seen, self.hidden_seen = None, None
+        self.fish_seen = None
+        self.digit_templates = None  # Templates of each digit still fitting the board
+        self.placements = []  # (row, col, digit index) set since last take_changes()
+        self.eliminations = []  # (row, col, mask of digits) removed since last take_changes()
+        self.nodes = 0  # Tries made by searches since initialize()
+        self.node_limit = None  # Tries after which searches give up, None for no limit
+        self.stop_event = None  # threading.Event that makes searches give up once set, or None
+        # Changes in order for undo: (row, col, mask of digits removed) or (row, col, None) for number set
+        self.trail = []
         self.change = False
+        self.contradiction = None  # Contradiction found by initialize() or None
+        self.search_func = self.search  # Used by backtrack(), search, cover_search or learning_search
         self.solv_func = [self.naked_singles, self.hidden_singles, self.block_rc, self.block_block,
-                          self.naked_subset, self.hidden_subset, self.solve_grid]
-
-    def initialize(self):
-
-        self.content = self.board.content
-        self.board_size, self.r_size, self.c_size = self.board.get_board_size()
-        self.digits = self.board.digits
+                          self.naked_subset, self.hidden_subset, self.fish, self.chains,
+                          self.template, self.forcing, self.backtrack]
+        # Same techniques applied only to queued units, cheapest first, used by propagate()
+        self.stages = [self.naked_units, self.hidden_units, self.block_rc_units, self.block_block_units,
+                       self.naked_subset_units, self.hidden_subset_units, self.fish_units, self.chain_units,
+                       self.template_units, self.forcing_units]
+        self.queues = None  # Units waiting to be checked by each stage
+        self.touched = set()  # Units changed since queues last updated
+
+    def initialize(self, content):
+        """ Start solving content, a qgrid.Grid
+            content is changed in place as numbers are set """
+
+        self.content = content
+        self.board_size = content.size
+        self.geometry = qgeometry.get_geometry(self.board_size)
+        self.digits = self.geometry.digits
+        self.all_digits = qbits.full_mask(self.board_size)
         self.squares = self.list_squares_rc()
-        self.poss_tiles = [[None] * self.board_size for _ in range(self.board_size)]
-        self.possibles = [[set()] * self.board_size for _ in range(self.board_size)]
+        # Possible digits in each cell as bitmask
+        self.possibles = [[0] * self.board_size for _ in range(self.board_size)]
+        # Possible positions of each digit in each unit as bitmask
+        # places[unit][digit index], bit n set if digit can go in cell n of geometry.units[unit]
+        self.places = [[0] * self.board_size for _ in range(3 * self.board_size)]
+        # Unit contents when last checked for naked and hidden subsets
+        self.naked_seen = [None] * (3 * self.board_size)
+        self.hidden_seen = [None] * (3 * self.board_size)
+        # Row places of each digit when last checked for fish
+        self.fish_seen = [None] * self.board_size
 
         self.change = False
+        self.placements, self.eliminations = [], []
+        self.nodes = 0
         self.set_possible()
-
-        # print("Sudoku", self.board.sudoku)
-        # print("Content", self.board.content)
+        self.contradiction = self.find_contradiction()
 
     # -------------------------------------------------------------------------
     # Solutions
 
     def solve(self):
-        """ Complete solution """
-        tot_func = len(self.solv_func) - 1
-        num_func = -1
-        count = 0
-
-        while any(item for sublist in self.possibles for item in sublist):
-            num_func = (num_func + 1) % tot_func
-            if num_func == 0:
-                if count == tot_func:
-                    self.solve_grid(self.content)
-                    self.board.load_board()
-                    break
-                count = 0
-            count += self.solv_func[num_func]()
+        """ Complete solution
+            Returns (placements, eliminations) made, see take_changes()
+            Nothing is done if board has a contradiction """
+        if self.contradiction is None:
+            self.propagate()
+            if any(item for sublist in self.possibles for item in sublist):
+                self.backtrack()
+        return self.take_changes()
+
+    def take_changes(self):
+        """ Return and clear changes made since last call as (placements, eliminations)
+            placements: [(row, col, num)], eliminations: [(row, col, mask of digits removed)] """
+        changes = [(row, col, self.digits[i]) for row, col, i in self.placements], self.eliminations
+        self.placements, self.eliminations = [], []
+        return changes
+
+    def propagate(self):
+        """ Apply techniques until none makes a change
+            Each stage only looks at units changed since it last ran
+            After any change start again from the cheapest stage """
+        all_units = range(3 * self.board_size)
+        self.queues = [set(all_units) for _ in self.stages]
+        self.touched.clear()
+        stage = 0
+        while stage < len(self.stages):
+            queue = self.queues[stage]
+            self.change = False
+            if queue:
+                units = sorted(queue)
+                queue.clear()
+                self.stages[stage](units)
+            if self.touched:
+                for queue in self.queues:
+                    queue.update(self.touched)
+                self.touched.clear()
+            stage = 0 if self.change else stage + 1
 
     # def get_next(self):
     #     """ Generator to give next function to call
@@ -83,11 +177,7 @@ class Solver:
     def solve_step(self, gen):
         """ Perform next step in solution """
         num_func = next(gen)
-        if num_func == len(self.solv_func) - 1:
-            self.solv_func[num_func](self.content)
-            self.board.load_board()
-        else:
-            self.solv_func[num_func]()
+        self.solv_func[num_func]()
         return num_func
 
     # -------------------------------------------------------------------------
@@ -108,9 +198,9 @@ class Solver:
         self.change = False
         for row in range(self.board_size):
             for col in range(self.board_size):
-                if len(self.possibles[row][col]) == 1:
-                    num = self.possibles[row][col].pop()
-                    self.set_number(num, row, col, "NS")
+                mask = self.possibles[row][col]
+                if qbits.POP_COUNT[mask] == 1:
+                    self.set_number(qbits.LOW_BIT[mask], row, col, "NS")
 
     def hidden_singles(self):
         """ Check for hidden singles """
@@ -125,20 +215,87 @@ class Solver:
         """ Go through rowa, columns and squares checking
             if only one cell can hold a particular value """
         self.change = False
+        units = self.geometry.units
         hidden = []
+        found = set()
         for index in range(self.board_size):
-            self.extend_list(hidden, [[num, pos[0]] for num, pos in self.get_row_dict(index).items() if len(pos) == 1])
-            self.extend_list(hidden, [[num, pos[0]] for num, pos in self.get_col_dict(index).items() if len(pos) == 1])
-            self.extend_list(hidden, [[num, pos[0]] for num, pos in self.get_squ_dict(index).items() if len(pos) == 1])
+            for unit in (index, self.board_size + index, 2 * self.board_size + index):
+                for i, places in enumerate(self.places[unit]):
+                    if qbits.POP_COUNT[places] == 1:
+                        item = (i, units[unit][qbits.LOW_BIT[places]])
+                        if item not in found:
+                            found.add(item)
+                            hidden.append(item)
         for item in hidden:
             self.set_number(item[0], item[1][0], item[1][1], "HS")
 
-    @staticmethod
-    def extend_list(lst1, lst2):
-        for item in lst2:
-            if item not in lst1:
-                lst1.append(item)
-        return lst1
+    def naked_units(self, units):
+        """ Set naked singles in cells of units """
+        cells = self.geometry.units
+        for unit in units:
+            for row, col in cells[unit]:
+                mask = self.possibles[row][col]
+                if qbits.POP_COUNT[mask] == 1:
+                    self.set_number(qbits.LOW_BIT[mask], row, col, "NS")
+
+    def hidden_units(self, units):
+        """ Set hidden singles in units """
+        cells = self.geometry.units
+        for unit in units:
+            for i, places in enumerate(self.places[unit]):
+                if qbits.POP_COUNT[places] == 1:
+                    row, col = cells[unit][qbits.LOW_BIT[places]]
+                    self.set_number(i, row, col, "HS")
+
+    def block_rc_units(self, units):
+        """ Check block and row/column interactions in units """
+        for unit in units:
+            if unit >= 2 * self.board_size:
+                self.pointing(unit - 2 * self.board_size)
+            else:
+                self.claiming(unit)
+
+    def block_block_units(self, units):
+        """ Check block and block interactions in bands and stacks with changed squares """
+        geometry = self.geometry
+        bands, stacks = set(), set()
+        for unit in units:
+            if unit >= 2 * self.board_size:
+                index = unit - 2 * self.board_size
+                bands.add(index // geometry.squares_across)
+                stacks.add(index % geometry.squares_across)
+        for band in sorted(bands):
+            self.block_block_lines(geometry.bands[band], geometry.square_pos_rows, geometry.square_row_masks)
+        for stack in sorted(stacks):
+            self.block_block_lines(geometry.stacks[stack], geometry.square_pos_cols, geometry.square_col_masks)
+
+    def naked_subset_units(self, units):
+        """ Check for naked subsets in units """
+        for unit in units:
+            self.process_list(unit)
+
+    def hidden_subset_units(self, units):
+        """ Check for hidden subsets in units """
+        for unit in units:
+            self.process_hidden(unit)
+
+    def fish_units(self, units):
+        """ Check for fish if any row or column changed """
+        if units[0] < 2 * self.board_size:
+            for i in range(self.board_size):
+                self.process_fish(i)
+
+    def chain_units(self, units):
+        """ Check for wings and colouring if anything changed """
+        self.chain_round()
+
+    def template_units(self, units):
+        """ Check templates if anything changed """
+        self.template_round()
+
+    def forcing_units(self, units):
+        """ Check forcing chains if anything changed """
+        self.forcing_round()
 
     def block_rc(self):
         """ Check for block and column/row interactions """
@@ -151,32 +308,64 @@ class Solver:
 
     def block_rc_round(self):
         """ Go through blocks checking for numbers only possible in single row or column
-            if found remove as possible from other blocks in that row or column """
-        n_row, n_col = [], []
+            if found remove as possible from other blocks in that row or column
+            Then go through rows and columns checking for numbers only possible in single block
+            if found remove as possible from other rows or columns in that block """
         self.change = False
         for index in range(self.board_size):
-            poss = self.get_squ_dict(index)
-            n_col = [[num, index, pos[0][1]] for num, pos in poss.items()
-                     if all([cell[1] == pos[0][1] for cell in pos])]
-            n_row = [[num, index, pos[0][0]] for num, pos in poss.items()
-                     if all([cell[0] == pos[0][0] for cell in pos])]
-
-        for item in n_row:
-            digit, square, row = item
-            squ = self.squares[square]
-            for col in range(self.board_size):
-                self.check_possibles(digit, row, col, squ)
-        for item in n_col:
-            digit, square, col = item
-            squ = self.squares[square]
-            for row in range(self.board_size):
-                self.check_possibles(digit, row, col, squ)
-
-    def check_possibles(self, digit, row, col, squ):
-        """ Check for item in possibles """
-        if (row, col) not in squ:
-            if digit in self.possibles[row][col]:
-                self.remove_possible(digit, row, col, "BRC Remove Possible", "")
+            self.pointing(index)
+        for unit in range(2 * self.board_size):
+            self.claiming(unit)
+
+    def pointing(self, index):
+        """ Remove digits confined to one row or column of square index
+            from the rest of that row or column """
+        geometry = self.geometry
+        size = self.board_size
+        for i, places in enumerate(self.places[2 * size + index]):
+            if not places:
+                continue
+            bit = 1 << i
+            for offset, row_mask in enumerate(geometry.square_row_masks):
+                if not places & ~row_mask:
+                    row = geometry.square_rows[index][offset]
+                    others = self.places[row][i] & ~geometry.square_col_bits[index]
+                    self.remove_from_unit(bit, row, others, "BRC Remove Possible")
+                    break
+            for offset, col_mask in enumerate(geometry.square_col_masks):
+                if not places & ~col_mask:
+                    col = geometry.square_cols[index][offset]
+                    others = self.places[size + col][i] & ~geometry.square_row_bits[index]
+                    self.remove_from_unit(bit, size + col, others, "BRC Remove Possible")
+                    break
+
+    def claiming(self, unit):
+        """ Remove digits confined to one square in row or column unit
+            from the rest of that square """
+        geometry = self.geometry
+        size = self.board_size
+        if unit < size:
+            squares, square_bits = geometry.row_squares[unit], geometry.square_col_bits
+            keep = geometry.square_row_masks[unit % geometry.r_size]
+        else:
+            squares, square_bits = geometry.col_squares[unit - size], geometry.square_row_bits
+            keep = geometry.square_col_masks[(unit - size) % geometry.c_size]
+        for i, places in enumerate(self.places[unit]):
+            if not places:
+                continue
+            for index in squares:
+                if not places & ~square_bits[index]:
+                    others = self.places[2 * size + index][i] & ~keep
+                    self.remove_from_unit(1 << i, 2 * size + index, others, "BRC Remove Possible")
+                    break
+
+    def remove_from_unit(self, bits, unit, cells, text):
+        """ Remove digits in mask bits from cells (mask of positions) in unit """
+        r_c_s = "rcs"[unit // self.board_size]
+        squ = self.geometry.units[unit]
+        for pos in qbits.BIT_LIST[cells]:
+            row, col = squ[pos]
+            self.remove_possible(bits, row, col, text, r_c_s)
 
     def block_block(self):
         """ Check for block and block interactions """
@@ -188,66 +377,39 @@ class Solver:
         return count
 
     def block_block_round(self):
-        """ Go through blocks checking for numbers only possible in two rows or columns
-            if found in two blocks remove as possible from other blocks in that row or column """
+        """ Go through bands and stacks of blocks checking for numbers only possible in the same
+            two rows or columns of two blocks
+            if found remove as possible from those rows or columns in the other blocks """
         self.change = False
-        block_horiz, block_vert = self.board_size // self.c_size, self.board_size // self.r_size
-        # For each block in column get digits and cells as dictionary {digit: [(row, col)]
-        # only if they occur in two columns in the block
-        for hblock in range(block_horiz):
-            col_poss = dict()
-            for vblock in range(block_vert):
-                index = hblock + vblock * block_horiz
-                col_poss[index] = {digit: cells for (digit, cells) in self.get_squ_dict(index).items()
-                                   if len(set([tup[1] for tup in cells])) == 2}
-            block_cols = self.process_bb(col_poss, 1)
-            for key, val in block_cols.items():
-                blocks, cols = val[0], val[1]
-                self.check_squares(key, blocks, cols, 1)
-        # For each block in row get digits and cells as dictionary {digit: [(row, col)]
-        # only if they occur in two rows in the block
-        for vblock in map(lambda x: x * block_horiz, range(block_vert)):
-            row_poss = dict()
-            for hblock in range(block_horiz):
-                index = vblock + hblock
-                row_poss[index] = {digit: cells for (digit, cells) in self.get_squ_dict(index).items()
-                                   if len(set([tup[0] for tup in cells])) == 2}
-            block_rows = self.process_bb(row_poss, 0)
-            for key, val in block_rows.items():
-                blocks, rows = val[0], val[1]
-                self.check_squares(key, blocks, rows, 0)
-
-    def check_squares(self, key, blocks, r_c_list, r_c):
-        """ key: digit to look for
-            blocks: list of blocks
-            r_c_list: set of rows or columns
-            r_c: 0 for rows and 1 for columns """
-        squares = self.get_squares_col(next(iter(r_c_list), None))
-        for squ in squares:
-            if squ not in blocks:
-                cells = self.get_square_rc(squ)
-                for cell in cells:
-                    if cell[r_c] in r_c_list and key in self.possibles[cell[0]][cell[1]]:
-                        self.remove_possible(key, cell[0], cell[1], "BB Remove Possible", "r" if r_c == 0 else "c")
-
-    @staticmethod
-    def process_bb(poss, rowcol):
-        """ poss: dictionary of digits in blocks { block index: {digit: [(row, col)]
-            returns list of digits that occur in two rows/columns as [[digit, block1, block2, r/c1, r/c2]] """
-        # Get all different digits in poss as a set
-        digits = set([item for sublist in [[*dct] for index, dct in poss.items()] for item in sublist])
-        # Rearrange occurrences of digits as list of lists [[digit, block_index, [(row, col)]]
-        comp = [[[dig, index, dct[dig]] for index, dct in poss.items() if dig in dct] for dig in digits]
-        # Reaarange as [[digit, block_index, {set of row/col nos}]] for digits in more than two row/col in block
-        comp = [[item[0], item[1], set([tup[rowcol] for tup in item[2]])]
-                for lst in comp for item in lst if len(item) >= 2]
-        # Remove all instances of digits only in one block
-        comp = [item for item in comp if sum(x.count(item[0]) for x in comp) > 1]
-        # Remove occurrences of digit in block but not in correct row/col pair
-        comp = [item for item in comp if [pos[2] for pos in comp if pos[0] == item[0]].count(item[2]) == 2]
-        # Convert to dictionary {digit: [[block_indices],{row/col nos]]
-        comp = dict((item[0], [[pos[1] for pos in comp if pos[0] == item[0]], item[2]]) for item in comp)
-        return comp
+        geometry = self.geometry
+        for band in geometry.bands:
+            self.block_block_lines(band, geometry.square_pos_rows, geometry.square_row_masks)
+        for stack in geometry.stacks:
+            self.block_block_lines(stack, geometry.square_pos_cols, geometry.square_col_masks)
+
+    def block_block_lines(self, blocks, pos_lines, line_masks):
+        """ blocks: indices of blocks sharing the same rows (band) or columns (stack)
+            pos_lines: table of lines in a block holding a mask of positions
+            line_masks: positions in a block of each of those rows or columns
+            Where a digit is only in the same n lines of n blocks (n >= 2)
+            remove it from those lines in the other blocks """
+        base = 2 * self.board_size
+        for i in range(self.board_size):
+            # {mask of lines holding digit: [blocks]} for digit i
+            lines = dict()
+            for index in blocks:
+                mask = pos_lines[self.places[base + index][i]]
+                if qbits.POP_COUNT[mask] >= 2:
+                    lines.setdefault(mask, []).append(index)
+            for mask, found in lines.items():
+                if len(found) == qbits.POP_COUNT[mask] < len(blocks):
+                    cells = 0
+                    for line in qbits.BIT_LIST[mask]:
+                        cells |= line_masks[line]
+                    for index in blocks:
+                        if index not in found:
+                            others = self.places[base + index][i] & cells
+                            self.remove_from_unit(1 << i, base + index, others, "BB Remove Possible")
 
     def naked_subset(self):
         """ Check for naked subsets """
@@ -262,53 +424,57 @@ class Solver:
         """ Go through rows, columns, checking for subsets of numbers in possibles
             if found remove from other cells in row, column or block  """
         self.change = False
-        for row in range(self.board_size):
-            subsets = enumerate(self.possibles[row])
-            self.process_list(row, subsets, "r")
-        for col in range(self.board_size):
-            subsets = enumerate([self.possibles[row][col] for row in range(self.board_size)])
-            self.process_list(col, subsets, "c")
-        for index in range(self.board_size):
-            squ = self.squares[index]
-            subsets = enumerate([self.possibles[cell[0]][cell[1]] for cell in squ])
-            self.process_list(index, subsets, "s")
-
-    def process_list(self, index, subsets, r_c_s):
-        """ Check for subsets in subsets
-            index: row, col, squ number
-            r_c_s: 'r' row, 'c' col, 's' square"""
-        for no in range(2, 1 + self.board_size // 2):
-            subset = [(n, s) for n, s in subsets if s and len(s) <= no]
-            if subset:
-                digits = subset[0][1].union(*[s[1] for s in subset])
-                possets = [set(s) for s in itertools.combinations(digits, no)]
-                for dig in possets:
-                    sets = []
-                    for item in subset:
-                        if item[1].issubset(dig):
-                            sets.append(item[0])
-                    if len(sets) == no:
-                        self.edit_poss(index, dig, sets, r_c_s)
-
-    def edit_poss(self, index, dig, sets, r_c_s):
-        """ Check for and remove relevant possibilities from self.possibles """
-        if r_c_s == "r":
-            for col in range(self.board_size):
-                if col not in sets:
-                    for no in dig:
-                        self.remove_possible(no, index, col, "NS Remove Possible", "r")
-        elif r_c_s == "c":
-            for row in range(self.board_size):
-                if row not in sets:
-                    for no in dig:
-                        self.remove_possible(no, row, index, "NS Remove Possible", "c")
-        elif r_c_s == "s":
-            squ = enumerate(self.squares[index])
-            for item in squ:
-                pos, cell = item 
-                if pos not in sets:
-                    for no in dig:
-                        self.remove_possible(no, cell[0], cell[1], "NS Remove Possible", "s")
+        for unit in range(3 * self.board_size):
+            self.process_list(unit)
+
+    def process_list(self, unit):
+        """ Check for n cells of unit holding only the same n digits
+            Skipped if the unit is unchanged since it was last checked
+            unit: index into geometry.units """
+        masks = [self.possibles[row][col] for row, col in self.geometry.units[unit]]
+        if masks == self.naked_seen[unit]:
+            return
+        self.naked_seen[unit] = masks
+        live = [(pos, mask) for pos, mask in enumerate(masks) if mask]
+        for cells, dig in self.find_subsets(live, len(live) // 2):
+            self.edit_poss(unit, dig, cells)
+
+    def edit_poss(self, unit, dig, cells):
+        """ Remove digits in dig from cells of unit not in cells (mask of positions) """
+        places = self.places[unit]
+        others = 0
+        for i in qbits.BIT_LIST[dig]:
+            others |= places[i]
+        self.remove_from_unit(dig, unit, others & ~cells, "NS Remove Possible")
+
+    @staticmethod
+    def find_subsets(items, max_size):
+        """ Find groups of n items whose masks together have only n bits, 2 <= n <= max_size
+            items: [(index, mask)] for live items
+            Unions are built one item at a time and abandoned once they have more than max_size bits
+            returns [(mask of item indices, union of masks)] """
+        found = []
+        items = [item for item in items if qbits.POP_COUNT[item[1]] <= max_size]
+        total = len(items)
+        pop_count = qbits.POP_COUNT
+
+        def extend(start, size, indices, union):
+            size += 1
+            for pos in range(start, total):
+                index, mask = items[pos]
+                new_union = union | mask
+                count = pop_count[new_union]
+                # Too many bits, or not enough items left to match them
+                if count > max_size or count > size + total - pos - 1:
+                    continue
+                if count == size >= 2:
+                    found.append((indices | 1 << index, new_union))
+                elif size < max_size:
+                    extend(pos + 1, size, indices | 1 << index, new_union)
+
+        if max_size >= 2:
+            extend(0, 0, 0, 0)
+        return found
 
     def hidden_subset(self):
         """ Check for hidden subsets """
@@ -323,199 +489,541 @@ class Solver:
         """ Go through rows, columns, checking for hidden subsets of numbers in possibles
             if found remove other values from these cells in row, column or block  """
         self.change = False
-        for row in range(self.board_size):
-            subsets = enumerate(self.possibles[row])
-            self.process_hidden(row, subsets, "r")
-        for col in range(self.board_size):
-            subsets = enumerate([self.possibles[row][col] for row in range(self.board_size)])
-            self.process_hidden(col, subsets, "c")
-        for index in range(self.board_size):
-            squ = self.squares[index]
-            subsets = enumerate([self.possibles[cell[0]][cell[1]] for cell in squ])
-            self.process_hidden(index, subsets, "s")
-
-    def process_hidden(self, index, subsets, r_c_s):
-        """ Check for subsets in subsets
-            index: row, col, squ number
-            r_c_s: 'r' row, 'c' col, 's' square"""
-        for no in range(2, 1 + self.board_size // 2):
-            subset = [(n, s) for n, s in subsets if s]
-            if subset:
-                digits = subset[0][1].union(*[s[1] for s in subset])
-                possets = [set(s) for s in itertools.combinations(digits, no)]
-                for dig in possets:
-                    sets = []
-                    for item in subset:
-                        if item[1].intersection(dig):
-                            sets.append(item[0])
-                    if len(sets) == no:
-                        self.edit_hidden(index, dig, sets, r_c_s)
-
-    def edit_hidden(self, index, dig, sets, r_c_s):
-        """ Check for and remove relevant possibilities from self.possibles """
-        if r_c_s == "r":
-            for col in sets:
-                poss_nos = self.possibles[index][col].copy()
-                for no in poss_nos:
-                    if no not in dig:
-                        self.remove_possible(no, index, col, "HS Remove Possible", "r")
-        elif r_c_s == "c":
-            for row in sets:
-                poss_nos = self.possibles[row][index].copy()
-                for no in poss_nos:
-                    if no not in dig:
-                        self.remove_possible(no, row, index, "HS Remove Possible", "c")
-        elif r_c_s == "s":
-            squ = enumerate(self.squares[index])
-            for item in squ:
-                pos, cell = item
-                if pos in sets:
-                    poss_nos = self.possibles[cell[0]][cell[1]].copy()
-                    for no in poss_nos:
-                        if no not in dig:
-                            self.remove_possible(no, cell[0], cell[1], "HS Remove Possible", "s")
-
-    def remove_possible(self, no, row, col, text, r_c_s):
-        """ Remove digit no from self.possibles[row][co] """
-        if no in self.possibles[row][col]:
-            self.possibles[row][col].discard(no)
+        for unit in range(3 * self.board_size):
+            self.process_hidden(unit)
+
+    def process_hidden(self, unit):
+        """ Check for n digits only possible in the same n cells of unit
+            Skipped if the unit is unchanged since it was last checked
+            unit: index into geometry.units """
+        places = self.places[unit]
+        if places == self.hidden_seen[unit]:
+            return
+        self.hidden_seen[unit] = places[:]
+        live = [(i, cells) for i, cells in enumerate(places) if cells]
+        for dig, cells in self.find_subsets(live, len(live) // 2):
+            self.edit_hidden(unit, dig, cells)
+
+    def edit_hidden(self, unit, dig, cells):
+        """ Remove all digits except those in dig from cells (mask of positions) in unit """
+        self.remove_from_unit(self.all_digits & ~dig, unit, cells, "HS Remove Possible")
+
+    def fish(self):
+        """ Check for fish (X-Wing, Swordfish, Jellyfish) """
+        self.change = True
+        count = 0
+        while self.change:
+            count += 1
+            self.fish_round()
+        return count
+
+    def fish_round(self):
+        """ Go through digits checking for n rows where digit only possible in the same n columns
+            if found remove digit from those columns in other rows, then the same with columns and rows """
+        self.change = False
+        for i in range(self.board_size):
+            self.process_fish(i)
+
+    def process_fish(self, i):
+        """ Check for fish of digit index i, up to MAX_FISH lines
+            Skipped if the digit is unchanged since it was last checked """
+        size = self.board_size
+        rows = [self.places[row][i] for row in range(size)]
+        if rows == self.fish_seen[i]:
+            return
+        self.fish_seen[i] = rows
+        for base, cover in ((0, size), (size, 0)):
+            lines = [(line, self.places[base + line][i]) for line in range(size) if self.places[base + line][i]]
+            for base_lines, cover_lines in self.find_subsets(lines, min(MAX_FISH, len(lines) // 2)):
+                for line in qbits.BIT_LIST[cover_lines]:
+                    others = self.places[cover + line][i] & ~base_lines
+                    self.remove_from_unit(1 << i, cover + line, others, "Fish Remove Possible")
+
+    def chains(self):
+        """ Check for wings and simple colouring """
+        self.change = True
+        count = 0
+        while self.change:
+            count += 1
+            self.chain_round()
+        return count
+
+    def chain_round(self):
+        """ Find bivalue cells and conjugate pairs once, then use them to check for
+            XY-Wings, XYZ-Wings and simple colouring
+            Eliminations found from this snapshot stay valid as possibles are removed """
+        self.change = False
+        bivalue, trivalue = dict(), []
+        for row, col in self.geometry.cells:
+            mask = self.possibles[row][col]
+            if qbits.POP_COUNT[mask] == 2:
+                bivalue[(row, col)] = mask
+            elif qbits.POP_COUNT[mask] == 3:
+                trivalue.append(((row, col), mask))
+        self.xy_wing(bivalue)
+        self.xyz_wing(bivalue, trivalue)
+        for i in range(self.board_size):
+            self.colouring(i, self.conjugate_pairs(i))
+
+    def xy_wing(self, bivalue):
+        """ Pivot cell {x, y} sees pincers {x, z} and {y, z}
+            z removed from cells seeing both pincers
+            bivalue: {cell: mask} of cells with two possibles """
+        peers, peer_sets = self.geometry.peers, self.geometry.peer_sets
+        for (row, col), pivot in bivalue.items():
+            wings = [(cell, bivalue[cell]) for cell in peers[row][col]
+                     if cell in bivalue and qbits.POP_COUNT[bivalue[cell] & pivot] == 1]
+            for n, (cell_a, mask_a) in enumerate(wings):
+                for cell_b, mask_b in wings[n + 1:]:
+                    digit = mask_a & mask_b
+                    if (mask_a & pivot != mask_b & pivot and qbits.POP_COUNT[digit] == 1
+                            and not digit & pivot):
+                        seen = peer_sets[cell_a[0]][cell_a[1]] & peer_sets[cell_b[0]][cell_b[1]]
+                        self.remove_from_cells(digit, seen, "XY Remove Possible")
+
+    def xyz_wing(self, bivalue, trivalue):
+        """ Pivot cell {x, y, z} sees pincers {x, z} and {y, z}
+            z removed from cells seeing pivot and both pincers
+            bivalue: {cell: mask} of cells with two possibles
+            trivalue: [(cell, mask)] of cells with three possibles """
+        peers, peer_sets = self.geometry.peers, self.geometry.peer_sets
+        for (row, col), pivot in trivalue:
+            wings = [(cell, bivalue[cell]) for cell in peers[row][col]
+                     if cell in bivalue and not bivalue[cell] & ~pivot]
+            for n, (cell_a, mask_a) in enumerate(wings):
+                for cell_b, mask_b in wings[n + 1:]:
+                    if mask_a != mask_b and mask_a | mask_b == pivot:
+                        seen = (peer_sets[row][col] & peer_sets[cell_a[0]][cell_a[1]] &
+                                peer_sets[cell_b[0]][cell_b[1]])
+                        self.remove_from_cells(mask_a & mask_b, seen, "XYZ Remove Possible")
+
+    def conjugate_pairs(self, i):
+        """ Return graph {cell: [cells]} joining the two cells of each unit
+            where digit index i has only two places """
+        graph = dict()
+        units = self.geometry.units
+        for unit, places in enumerate(self.places):
+            if qbits.POP_COUNT[places[i]] == 2:
+                cell_a, cell_b = (units[unit][pos] for pos in qbits.BIT_LIST[places[i]])
+                graph.setdefault(cell_a, []).append(cell_b)
+                graph.setdefault(cell_b, []).append(cell_a)
+        return graph
+
+    def colouring(self, i, graph):
+        """ Colour each chain of conjugate pairs of digit index i with two colours
+            One colour holds the digit in every cell of the chain
+            Two cells of the same colour in one unit: remove digit from that colour
+            A cell seeing both colours: remove digit from that cell """
+        peer_sets = self.geometry.peer_sets
+        bit = 1 << i
+        colour = dict()
+        for start in graph:
+            if start in colour:
+                continue
+            colour[start] = 0
+            chain = [start]
+            for cell in chain:
+                for other in graph[cell]:
+                    if other not in colour:
+                        colour[other] = 1 - colour[cell]
+                        chain.append(other)
+            sides = [[cell for cell in chain if colour[cell] == side] for side in (0, 1)]
+            seen = [set(), set()]
+            for side, cells in enumerate(sides):
+                for row, col in cells:
+                    seen[side] |= peer_sets[row][col]
+            wrapped = False
+            for side, cells in enumerate(sides):
+                if seen[side].intersection(cells):
+                    self.remove_from_cells(bit, cells, "Colour Remove Possible")
+                    wrapped = True
+            if not wrapped:
+                self.remove_from_cells(bit, (seen[0] & seen[1]).difference(chain), "Colour Remove Possible")
+
+    def template(self):
+        """ Check templates for each digit """
+        self.change = True
+        count = 0
+        while self.change:
+            count += 1
+            self.template_round()
+        return count
+
+    def template_round(self):
+        """ Drop templates of each digit that no longer fit the board
+            Remove digit from cells not used by any template left """
+        self.change = False
+        if self.digit_templates[0] is None:
+            return  # Too many templates for board size
+        size = self.board_size
+        cells = self.content.cells
+        # Cells where each digit is set or possible as bitboard
+        allowed = [0] * size
+        for row, col in self.geometry.cells:
+            bit = 1 << (row * size + col)
+            code = cells[row * size + col]
+            if code == qgrid.BLANK:
+                for i in qbits.BIT_LIST[self.possibles[row][col]]:
+                    allowed[i] |= bit
+            else:
+                allowed[code - 1] |= bit
+        for i in range(size):
+            if bin(allowed[i]).count("1") == size:
+                continue  # Digit only fits one way, nothing to remove
+            excluded = ~allowed[i]
+            templates = [template for template in self.digit_templates[i] if not template & excluded]
+            self.digit_templates[i] = templates
+            used = 0
+            for template in templates:
+                used |= template
+            unused = allowed[i] & ~used
+            while unused:
+                bit = unused & -unused
+                unused ^= bit
+                row, col = divmod(bit.bit_length() - 1, size)
+                self.remove_possible(1 << i, row, col, "Template Remove Possible", "")
+
+    def forcing(self):
+        """ Check forcing chains """
+        self.change = True
+        count = 0
+        while self.change:
+            count += 1
+            self.forcing_round()
+        return count
+
+    def forcing_round(self):
+        """ Assume each possible in cells with up to MAX_FORCING possibles and follow singles
+            A possible leading to a contradiction is removed
+            Numbers set whichever possible is assumed are set """
+        self.change = False
+        pop_count = qbits.POP_COUNT
+        cells = sorted((pop_count[self.possibles[row][col]], row, col) for row, col in self.geometry.cells
+                       if 2 <= pop_count[self.possibles[row][col]] <= MAX_FORCING)
+        for _, row, col in cells:
+            common = None
+            for i in qbits.BIT_LIST[self.possibles[row][col]]:
+                placed = self.probe(i, row, col)
+                if placed is None:
+                    self.remove_possible(1 << i, row, col, "FC Remove Possible", "")
+                else:
+                    common = placed if common is None else common & placed
+            for r, c, num in sorted(common or ()):
+                if self.possibles[r][c] & 1 << num:
+                    self.set_number(num, r, c, "FC")
+
+    def probe(self, num, row, col):
+        """ Set digit index num in (row, col) and follow naked and hidden singles from there
+            Returns set of (row, col, digit index) set, or None if a contradiction is found
+            All changes are undone before returning """
+        mark = self.checkpoint()
+        touched, change, templates = self.touched, self.change, self.digit_templates[:]
+        self.touched = set()
+        self.set_number(num, row, col, "FC")
+        placed = None
+        if self.follow_singles() is None:
+            placed = set(self.placements[mark[1]:])
+        self.undo(mark)
+        self.touched, self.change, self.digit_templates = touched, change, templates
+        return placed
+
+    def follow_singles(self):
+        """ Set naked and hidden singles in touched units until none are left
+            Returns Contradiction found in a changed unit or None """
+        while self.touched:
+            units = sorted(self.touched)
+            self.touched.clear()
+            for unit in units:
+                reason = self.unit_contradiction(unit)
+                if reason is not None:
+                    return reason
+            self.naked_units(units)
+            self.hidden_units(units)
+        return None
+
+    def find_contradiction(self):
+        """ Check every unit then follow singles looking for a contradiction
+            Singles set are undone, board is left unchanged
+            Returns Contradiction or None """
+        mark = self.checkpoint()
+        touched, change = self.touched, self.change
+        self.touched = set(range(3 * self.board_size))
+        reason = self.follow_singles()
+        self.undo(mark)
+        self.touched, self.change = touched, change
+        return reason
+
+    def unit_contradiction(self, unit):
+        """ Return Contradiction if unit has a digit set twice, a blank cell with no possibles
+            or a digit neither set nor possible anywhere in it, otherwise None """
+        cells, possibles, size = self.content.cells, self.possibles, self.board_size
+        used, found = 0, 0
+        for row, col in self.geometry.units[unit]:
+            code = cells[row * size + col]
+            if code != qgrid.BLANK:
+                bit = 1 << (code - 1)
+                if used & bit:
+                    return Contradiction(Contradiction.DUPLICATE, unit, self.unit_name(unit),
+                                         digit=self.digits[code - 1])
+                used |= bit
+            elif possibles[row][col]:
+                found |= possibles[row][col]
+            else:
+                return Contradiction(Contradiction.NO_POSSIBLES, unit, self.unit_name(unit), cell=(row, col))
+        missing = self.all_digits & ~(used | found)
+        if missing:
+            return Contradiction(Contradiction.NO_PLACE, unit, self.unit_name(unit),
+                                 digit=self.digits[qbits.LOW_BIT[missing]])
+        return None
+
+    def unit_name(self, unit):
+        """ Return unit as text, e.g. "row 3" """
+        kind, index = divmod(unit, self.board_size)
+        return "{} {}".format(("row", "column", "square")[kind], index + 1)
+
+    def remove_from_cells(self, bits, cells, text):
+        """ Remove digits in mask bits from all cells in iterable of (row, col) """
+        for row, col in cells:
+            if self.possibles[row][col] & bits:
+                self.remove_possible(bits, row, col, text, "")
+
+    def remove_possible(self, bits, row, col, text, r_c_s):
+        """ Remove digits in mask bits from self.possibles[row][col] """
+        mask = self.possibles[row][col]
+        removed = mask & bits
+        if removed:
+            self.possibles[row][col] = mask ^ removed
+            self.remove_places(removed, row, col)
+            self.trail.append((row, col, removed))
+            self.eliminations.append((row, col, removed))
             self.change = True
 
-    def solve_grid(self, grid):
-        """ A backtracking/recursive function to check all possible combinations of numbers until solution is found """
-        # Find next empty cell
-        row, col = 0, 0
-        for i in range(0, self.board_size ** 2):
-            row = i // self.board_size
-            col = i % self.board_size
-            if grid[row][col] == '0':
-                for value in self.digits:
-                    # Check that this value has not already been used on this row
-                    if value not in grid[row]:
-                        # Check that this value has not already been used on this column
-                        if value not in [grid[row][col] for row in range(self.board_size)]:
-                            # Check that this value has not already been used on this square
-                            if value not in (self.get_square_cell_grid((row, col), grid)):
-                                grid[row][col] = value
-                                if self.check_grid(grid):
-                                    return True
-                                else:
-                                    if self.solve_grid(grid):
-                                        return True
-                break
-        grid[row][col] = '0'
-
-    def check_grid(self, grid):
-        """ Check for completely filled grig """
-        for row in range(0, self.board_size):
-            for col in range(0, self.board_size):
-                if grid[row][col] == '0':
-                    return False
-        return True
+    def backtrack(self):
+        """ Fill all blank cells by backtracking and record them as placements
+            Not tried if board has a contradiction """
+        if self.contradiction is None:
+            self.search_func()
+
+    def search(self):
+        """ Fill blank cells by trying each possible in turn, following singles after each try
+            Failed tries are undone from the trail
+            Returns True when board is complete, otherwise board is left unchanged """
+        mark = self.checkpoint()
+        self.touched = set(range(3 * self.board_size))
+        if self.follow_singles() is None:
+            for _ in self.search_all():
+                return True
+        self.undo(mark)
+        return False
+
+    def solutions(self, limit=None):
+        """ Generate each solution as a string of digits, row by row
+            Stops after limit solutions if given
+            Only the current try is held, board is left unchanged when finished or closed """
+        mark = self.checkpoint()
+        try:
+            self.touched = set(range(3 * self.board_size))
+            if self.contradiction is None and limit != 0 and self.follow_singles() is None:
+                found = 0
+                for _ in self.search_all():
+                    yield self.content.text()
+                    found += 1
+                    if found == limit:
+                        return
+        finally:
+            self.undo(mark)
+
+    def write_solutions(self, filename, limit=None):
+        """ Write each solution to filename as one line of digits, see solutions()
+            Returns number of solutions written """
+        count = 0
+        with open(filename, 'w') as f:
+            for solution in self.solutions(limit):
+                f.write(solution + "\n")
+                count += 1
+        return count
+
+    def cover_search(self):
+        """ Fill blank cells with the first solution found by exact cover
+            Returns True when board is complete, otherwise board is left unchanged """
+        cover = qdlx.DancingLinks(self.content, self.possibles, self.stopped)
+        for solution in cover.solutions(1):
+            self.nodes += cover.nodes
+            for num, row, col in solution:
+                self.set_number(num, row, col, "DL")
+            return True
+        self.nodes += cover.nodes
+        return False
+
+    def learning_search(self):
+        """ Fill blank cells by search that learns nogoods and jumps back past choices not involved
+            Returns True when board is complete, otherwise board is left unchanged """
+        search = qlearn.LearningSearch(self)
+        found = search.search()
+        self.nodes += search.nodes
+        return found
+
+    def search_all(self):
+        """ Try each of fewest_tries() in turn and search on from there
+            Yields with the board complete for each solution, undoing each try after """
+        if self.is_complete():
+            yield
+            return
+        mark = self.checkpoint()
+        for num, row, col in self.fewest_tries():
+            if self.stopped():
+                return
+            self.nodes += 1
+            self.touched = set()
+            self.set_number(num, row, col, "BT")
+            if self.follow_singles() is None:
+                yield from self.search_all()
+            self.undo(mark)
+
+    def stopped(self, nodes=0):
+        """ Return True if searches should give up, after node_limit tries or once stop_event is set
+            nodes: tries made by a search not yet added to self.nodes """
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        return self.node_limit is not None and self.nodes + nodes >= self.node_limit
+
+    def fewest_tries(self):
+        """ Return [(digit index, row, col)] for every possible of the blank cell with fewest possibles,
+            or every place of the digit with fewest places in a unit if that has fewer """
+        pop_count = qbits.POP_COUNT
+        best, cell = self.board_size + 1, None
+        for row, col in self.geometry.cells:
+            count = pop_count[self.possibles[row][col]]
+            if 0 < count < best:
+                best, cell = count, (row, col)
+                if count == 2:
+                    break
+        if best > 2:
+            for unit, unit_places in enumerate(self.places):
+                for i, places in enumerate(unit_places):
+                    if 0 < pop_count[places] < best:
+                        best = pop_count[places]
+                        cells = self.geometry.units[unit]
+                        tries = [(i, cells[pos][0], cells[pos][1]) for pos in qbits.BIT_LIST[places]]
+                if best == 2:
+                    break
+            if best < pop_count[self.possibles[cell[0]][cell[1]]]:
+                return tries
+        row, col = cell
+        return [(i, row, col) for i in qbits.BIT_LIST[self.possibles[row][col]]]
+
+    def is_complete(self):
+        """ Return True if every cell is filled """
+        return self.content.is_full()
 
     # -------------------------------------------------------------------------
     # Routines to get list of possible entries for each cell
 
     def set_possible(self):
-        """ Fill in all initial possibilities """
-        for row in range(self.board_size):
-            for col in range(self.board_size):
-                if self.content[row][col] == "0":
-                    self.possibles[row][col] = set(self.digits)
-                    poss = set(self.possibles[row][col])
-                    r_num = self.get_row(row)
-                    c_num = self.get_column(col)
-                    s_num = self.get_square_cell((row, col))
-                    for num in poss:
-                        if num in r_num or num in c_num or num in s_num:
-                            self.possibles[row][col].discard(num)
+        """ Fill in all initial possibilities
+            Starts a new trail as earlier changes cannot be undone
+            Templates filtered against an earlier board are dropped too """
+        self.trail = []
+        self.digit_templates = [qtemplates.get_templates(self.board_size)] * self.board_size
+        content = self.content
+        row_used = [0] * self.board_size
+        col_used = [0] * self.board_size
+        squ_used = [0] * self.board_size
+        for index, squ in enumerate(self.squares):
+            for row, col in squ:
+                bit = (1 << content.get(row, col)) >> 1  # No bit for blank
+                row_used[row] |= bit
+                col_used[col] |= bit
+                squ_used[index] |= bit
+        for index, squ in enumerate(self.squares):
+            for row, col in squ:
+                if content.is_blank(row, col):
+                    used = row_used[row] | col_used[col] | squ_used[index]
+                    self.possibles[row][col] = self.all_digits & ~used
                 else:
-                    self.possibles[row][col] = set()
+                    self.possibles[row][col] = 0
+        self.set_places()
+
+    def set_places(self):
+        """ Fill in possible positions of each digit in each unit from self.possibles """
+        for unit, cells in enumerate(self.geometry.units):
+            places = [0] * self.board_size
+            for pos, (row, col) in enumerate(cells):
+                for i in qbits.BIT_LIST[self.possibles[row][col]]:
+                    places[i] |= 1 << pos
+            self.places[unit] = places
+
+    def add_places(self, bits, row, col):
+        """ Add (row, col) to places of digits in mask bits """
+        digits = qbits.BIT_LIST[bits]
+        for unit, pos in self.geometry.cell_units[row][col]:
+            places = self.places[unit]
+            bit = 1 << pos
+            for i in digits:
+                places[i] |= bit
+            self.touched.add(unit)
+
+    def remove_places(self, bits, row, col):
+        """ Remove (row, col) from places of digits in mask bits """
+        digits = qbits.BIT_LIST[bits]
+        for unit, pos in self.geometry.cell_units[row][col]:
+            places = self.places[unit]
+            keep = ~(1 << pos)
+            for i in digits:
+                places[i] &= keep
+            self.touched.add(unit)
 
     def reset_possible(self, num, row, col):
-        """ Reset possibles after num in (row, col) """
-        self.possibles[row][col] = set()
-        for c in range(self.board_size):
-            if num in self.possibles[row][c]:
-                self.possibles[row][c].discard(num)
-        for r in range(self.board_size):
-            if num in self.possibles[r][col]:
-                self.possibles[r][col].discard(num)
-        index = self.get_square_index((row, col))
-        squ = self.squares[index]
-        for cell in squ:
-            if num in self.possibles[cell[0]][cell[1]]:
-                self.possibles[cell[0]][cell[1]].discard(num)
-
-    def show_possibles(self):
-        """ Show possible values on board
+        """ Reset possibles after digit index num in (row, col) """
+        bit = 1 << num
+        possibles = self.possibles
+        self.remove_places(possibles[row][col], row, col)
+        self.trail.append((row, col, possibles[row][col]))
+        possibles[row][col] = 0
+        for r, c in self.geometry.peers[row][col]:
+            if possibles[r][c] & bit:
+                possibles[r][c] ^= bit
+                self.remove_places(bit, r, c)
+                self.trail.append((r, c, bit))
+
+    def get_possibles(self, row, col):
+        """ Return list of possible digits in (row, col)
             Used by Hint """
-        for row in range(self.board_size):
-            for col in range(self.board_size):
-                poss = list(self.possibles[row][col])
-                if poss:
-                    self.board.show_poss_tile(poss, row, col)
-
-    def redo_possibles(self):
-        """ Refresh possible values on board """
-        self.remove_possibles()
-        self.set_possible()
-        self.show_possibles()
-
-    def remove_possibles(self):
-        """ Remove possible values from board """
-        for row in range(self.board_size):
-            for col in range(self.board_size):
-                self.board.remove_poss_tile(row, col)
+        return qbits.mask_digits(self.possibles[row][col], self.digits)
 
     # -------------------------------------------------------------------------
     # Set number in board
 
     def set_number(self, num, row, col, where=""):
-        """ Insert number on board """
-        self.content[row][col] = num
-        self.possibles[row][col] = set()
-        self.board.set_num(num, row, col)
+        """ Insert digit index num on board """
+        self.content.set(row, col, num + 1)
+        self.placements.append((row, col, num))
+        self.trail.append((row, col, None))
         self.reset_possible(num, row, col)
         self.change = True
 
     # -------------------------------------------------------------------------
-    # Dictionary functions
-
-    def get_row_dict(self, row):
-        """ Return dictionary of possible digits in row """
-        return self.get_dict(self.possibles[row], "R", row)
-
-    def get_col_dict(self, col):
-        """ Return dictionary of possible digits in column """
-        return self.get_dict([self.possibles[row][col] for row in range(self.board_size)], "C", col)
-
-    def get_squ_dict(self, index):
-        """ Return dictionary of possible digits in square """
-        squ = self.squares[index]
-        return self.get_dict([self.possibles[cell[0]][cell[1]] for cell in squ], "S", squ)
+    # Undo
+
+    def checkpoint(self):
+        """ Return mark to pass to undo() to go back to the current state """
+        return len(self.trail), len(self.placements), len(self.eliminations)
+
+    def undo(self, mark):
+        """ Undo numbers set and possibles removed since checkpoint() gave mark """
+        trail_len, placements_len, eliminations_len = mark
+        while len(self.trail) > trail_len:
+            row, col, bits = self.trail.pop()
+            if bits is None:
+                self.content.set(row, col, qgrid.BLANK)
+            else:
+                self.possibles[row][col] |= bits
+                self.add_places(bits, row, col)
+        del self.placements[placements_len:]
+        del self.eliminations[eliminations_len:]
 
-    @staticmethod
-    def get_dict(lst, rcs=None, pos=None):
-        """ Create dictionary of all possible values in row/col/square
-            lst: list of sets, rcs: type R,C or S, pos: row no, col no, list of square cells
-            returns {digit: [list of cell positions as (row, col)]} """
-        digits = lst[0].union(*lst)
-        no_digits = dict()
-        for dig in digits:
-            where = []
-            for s in enumerate(lst):
-                if dig in s[1]:
-                    if rcs == "S":
-                        where.append(pos[s[0]])
-                    elif rcs == "R":
-                        where.append((pos, s[0]))
-                    elif rcs == "C":
-                        where.append((s[0], pos))
-                    else:
-                        where.append(s[0])
-            no_digits[dig] = where
-        return no_digits
+    # -------------------------------------------------------------------------
+    # Dictionary functions
 
     @staticmethod
     def get_numbers(fnct, index):
@@ -527,106 +1035,48 @@ class Solver:
     # Routines to get lists of entries in row, column, square
 
     def list_squares_rc(self):
-        """ Return list of lists of cells in squares
-            [[list of cells in squ n as (row, col) tuples] """
-        squ = []
-        for block in range(self.board_size):
-            squ.append(self.get_square_rc(block))
-        return squ
+        """ Return tuple of tuples of cells in squares
+            ((cells in squ n as (row, col) tuples)) """
+        return self.geometry.squares
 
     def get_square_rc(self, index):
-        """ Return list of cells in one square as [(row,col) tuples] """
-        squ = []
-        start_r = index // self.r_size * self.r_size
-        start_c = index % self.r_size * self.c_size
-        for row in range(start_r, start_r + self.r_size):
-            for col in range(start_c, start_c + self.c_size):
-                squ.append((row, col))
-        return squ
+        """ Return cells in one square as ((row,col) tuples) """
+        return self.geometry.squares[index]
 
     def get_row(self, row):
-        """ Return whole row  """
-        return self.content[row]
+        """ Return whole row as digit characters """
+        return self.get_square_list(self.geometry.rows[row])
 
     def get_column(self, col):
-        """ Return whole column """
-        return [self.content[row][col] for row in range(self.board_size)]
+        """ Return whole column as digit characters """
+        return self.get_square_list(self.geometry.cols[col])
 
     def get_square(self, index):
         """ get list of elements in square by index """
-        square = []
-        for cell in self.squares[index]:
-            square.append(self.content[cell[0]][cell[1]])
-        return square
+        return self.get_square_list(self.squares[index])
 
     def get_square_index(self, cell):
         """ Return index of square containing cell """
-        return next(s for s, square in enumerate(self.squares) if cell in square)
+        return self.geometry.square_of[cell[0]][cell[1]]
 
     def get_square_cell(self, cell):
         """ get list of elements in square containing cell """
-        index = self.get_square_index(cell)
-        square = []
-        for cell in self.squares[index]:
-            square.append(self.content[cell[0]][cell[1]])
-        return square
-
-    def get_square_cell_grid(self, cell, grid):
-        """ get list of elements in square containing cell """
-        index = self.get_square_index(cell)
-        square = []
-        for cell in self.squares[index]:
-            square.append(grid[cell[0]][cell[1]])
-        return square
+        return self.get_square(self.get_square_index(cell))
 
     def get_square_list(self, squ):
         """ get list of elements in square by cell list """
-        square = []
-        for cell in squ:
-            square.append(self.content[cell[0]][cell[1]])
-        return square
+        return [self.content.char(row, col) for row, col in squ]
 
     def get_squares_row(self, row):
-        """ Generates indices of blocks in a row  """
-        for squ in range(self.board_size // self.c_size):
-            yield row // self.r_size + squ
+        """ Return indices of blocks in a row  """
+        return self.geometry.row_squares[row]
 
     def get_squares_col(self, col):
-        """ Generates indices of blocks in a column  """
-        for squ in range(self.board_size // self.r_size):
-            yield col // self.c_size + squ * (self.board_size // self.c_size)
+        """ Return indices of blocks in a column  """
+        return self.geometry.col_squares[col]
 
     @staticmethod
     def transpose(lst):
         """ Transpose rows and columns """
         return list(zip(*lst))
 
-
-class Msg(QLabel):
-    """ Class defines showing of messages """
-
-    def __init__(self, scene, parent=None):
-        super(Msg, self).__init__(parent)
-
-        self.scene = scene
-        self.setLineWidth(5)
-        self.setMidLineWidth(5)
-        self.setStyleSheet("background-color:rgb(230, 200, 167); color : black;")
-        self.move(Cons.INSTR_RECT[0], Cons.INSTR_RECT[1])
-        self.resize(Cons.INSTR_RECT[2], Cons.INSTR_RECT[3])
-        self.setFont(QFont("Arial", 18))
-        self.setAlignment(Qt.AlignCenter)
-        self.setWordWrap(True)
-        self.setTextFormat(Qt.PlainText)
-        self.proxy = self.scene.addWidget(self)
-
-    def show_msg(self, text):
-        """ Show message """
-
-        self.setText(text)
-        self.show()
-
-    def clear_msg(self):
-        """ Clear message """
-
-        self.clear()
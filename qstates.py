@@ -1,25 +1,31 @@
 """ Enter and exit procedures for all states
     in game state machine """
 
+import logging
 import math
 import os
 
 from PyQt5 import QtPrintSupport
 from PyQt5 import QtSvg
-from PyQt5.QtCore import Qt, QObject, QPoint, QCoreApplication, QByteArray
+from PyQt5.QtCore import Qt, QObject, QPoint, QCoreApplication, QByteArray, pyqtSignal
 from PyQt5.QtGui import QPainter, QTextCursor
 from PyQt5.QtWidgets import (QWidget, QTextEdit, QPushButton, QDialog,
                              QFileDialog, QInputDialog, QGridLayout, QGraphicsScene, QGraphicsView,
-                             QMenu)
+                             QMenu, QMessageBox)
 
 import Constants as Cons
+import qbackends
 import qbwrdd
+import qgrid
+import qpool
 import qsolver
 
 
 class States(QObject):
     """ Class holding all entry and exit actions for states """
 
+    result_ready = pyqtSignal(object, object)  # Handler and finished Future of a solver pool request
+
     def __init__(self, scene, machine):
         super(States, self).__init__()
 
@@ -38,9 +44,15 @@ class States(QObject):
         self.board.draw_board()
         self.board_size = self.board.board_size
         self.digits = self.board.digits
-        self.solver = qsolver.Solver(self.board)
-        self.msg = qsolver.Msg(self.scene)
-        self.solver.initialize()
+        self.solver = qsolver.Solver()
+        self.solver.node_limit = qbackends.NODE_LIMITS["mrv"]  # Backtracking in Step runs in the GUI thread
+        self.msg = qbwrdd.Msg(self.scene)
+        self.solver.initialize(self.board.content)
+        # Solve and checks of entries run in the solver pool, results come back through result_ready
+        self.pool = qpool.SolverPool()
+        self.result_ready.connect(self.handle_result)
+        QCoreApplication.instance().aboutToQuit.connect(self.close_pool)
+        self.check_request = 0  # Latest check, older results are dropped
 
     # -------------------------------------------------------------------------
     def s_enter_wait(self):
@@ -63,7 +75,7 @@ class States(QObject):
         self.msg.show_msg(self.current_state)
 
         # If board empty ask for size
-        if all(x == self.board.sudoku[0] for x in self.board.sudoku):
+        if self.board.sudoku.is_empty():
             menu = QMenu("Choose Size")
             fourAction = menu.addAction("4 x 4")
             sixAction = menu.addAction("6 x 6")
@@ -71,7 +83,10 @@ class States(QObject):
             nineAction = menu.addAction("9 x 9")
             tenAction = menu.addAction("10 x 10")
             twelveAction = menu.addAction("12 x 12")
-            board_size = {fourAction: 4, sixAction: 6, eightAction: 8, nineAction: 9, tenAction: 10, twelveAction: 12}
+            sixteenAction = menu.addAction("16 x 16")
+            twentyfiveAction = menu.addAction("25 x 25")
+            board_size = {fourAction: 4, sixAction: 6, eightAction: 8, nineAction: 9, tenAction: 10, twelveAction: 12,
+                          sixteenAction: 16, twentyfiveAction: 25}
             action = menu.exec_(
                 QPoint(Cons.BUTTON_X + Cons.SETUP_BUTTON[0] - 5, Cons.BUTTON_Y + Cons.SETUP_BUTTON[1] - 30))
             size = board_size.get(action, 9)
@@ -91,9 +106,10 @@ class States(QObject):
         if self.result[0] != "error":
             self.board.clear_area()
             self.board.set_sudoku()
-            self.board.freeze_sudoku()
-            self.solver.initialize()
+            self.solver.initialize(self.board.content)
             self.step = False
+            if self.check_unique():
+                self.board.freeze_sudoku()
         self.result = (None,)
         self.msg.clear_msg()
 
@@ -107,13 +123,17 @@ class States(QObject):
 
         cancel, new_sudoku, new_content = self.load_file()
         if not cancel:
-            self.reset_board(len(new_sudoku))
-            self.board.sudoku = list(new_sudoku)
-            self.board.content = list(new_content)
+            self.reset_board(new_sudoku.size)
+            # Content starts as a copy of the sudoku, so saved moves are changes since the start
+            self.board.sudoku = new_sudoku
+            self.board.content = new_sudoku.copy()
+            self.board.set_start()
+            self.board.content.update(new_content)
             self.board.load_board()
             self.board.freeze_sudoku()
-            self.solver.initialize()
+            self.solver.initialize(self.board.content)
             self.step = False
+            self.check_solvable()
 
         self.machine.action_complete.emit()
 
@@ -133,7 +153,8 @@ class States(QObject):
             # Store list of start lines in indexes
             indexes = None
             size = len(data[0]) - 1
-            if size in Cons.SIZE_DICT:
+            # A line of 16 could be a 4 x 4 board or one row of 16 x 16, rows if it is followed by more
+            if size in Cons.SIZE_DICT and all(len(line.rstrip("\n")) == size for line in data[:size]):
                 no_lines = size
                 # If there is a separator between squares use to get positions
                 # Otherwise use size of square - accommadates different sizes in same file
@@ -177,28 +198,12 @@ class States(QObject):
                         new_data = new_data + data[row].strip()
                 else:
                     new_data = data[no].strip()
-                new_sudoku = self.get_list(size, new_data)
-                new_content = [row[:] for row in new_sudoku]
+                new_sudoku = qgrid.Grid.from_text(new_data[:size * size], size)
+                new_content = new_sudoku.copy()
                 if data[1] == "CONTENT\n":
-                    new_content = self.get_list(size, data[2])
+                    new_content = qgrid.Grid.from_text(data[2][:size * size], size)
         return cancel, new_sudoku, new_content
 
-    def get_list(self, size, data):
-        new_list = []
-        for i in range(size):
-            new_list.append(self.load_row(size, i * size, data))
-        return new_list
-
-    @staticmethod
-    def load_row(size, start, data):
-        new_row = []
-        for i in range(start, start + size):
-            if data[i] == ".":
-                new_row.append("0")
-            else:
-                new_row.append(data[i])
-        return new_row
-
     @staticmethod
     def get_integer(maximum):
         num, ok_pressed = QInputDialog.getInt(QCoreApplication.instance().activeWindow(), "Enter Number", "Number:", 1,
@@ -229,32 +234,16 @@ class States(QObject):
                 filename = filename + '.txt'
             try:
                 with open(filename, 'w') as f:
-                    f.write(self.convert_board(self.board.sudoku))
+                    f.write(self.board.sudoku.text("."))
                     if self.board.content != self.board.sudoku:
                         f.write("\nCONTENT\n")
-                        f.write(self.convert_board(self.board.content))
+                        f.write(self.board.content.text("."))
             except (IOError, OSError) as inst:
                 print("IO/OSError", inst.errno, "-", os.strerror(inst.errno))
             else:
                 print("Error")
         self.machine.action_complete.emit()
 
-    def convert_board(self, lst):
-        new_data = ""
-        for row in lst:
-            new_data += self.convert(row)
-        return new_data
-
-    @staticmethod
-    def convert(row):
-        new_row = ""
-        for no in row:
-            if no == "0":
-                new_row += "."
-            else:
-                new_row += no
-        return new_row
-
     def s_exit_save(self):
         """ Exit save board state """
         self.msg.clear_msg()
@@ -268,12 +257,28 @@ class States(QObject):
         print("DEBUG", self.current_state)
         self.msg.show_msg(self.current_state)
 
-        self.solver.solve()
-        # solved = self.solver.solve_grid(self.solver.content)
-        # self.board.load_board()
+        # Solved in the solver pool so the window keeps responding, show_solution() sets the numbers
+        self.submit(self.pool.solve(self.board.content), self.show_solution)
 
         self.machine.action_complete.emit()
 
+    def show_solution(self, solution):
+        """ Set numbers of solution from the solver pool in the blank cells
+            Dropped if the board has changed since so it no longer fits """
+        if solution is None:
+            QMessageBox.warning(QCoreApplication.instance().activeWindow(), "No Solution",
+                                "No solution found for this board")
+            return
+        content = self.board.content
+        if any(not content.is_blank(row, col) and content.get(row, col) != solution.get(row, col)
+               for row, col in self.board.geometry.cells):
+            return
+        placements = [(row, col, solution.char(row, col)) for row, col in content.blanks()]
+        for row, col, num in placements:
+            content.set_char(row, col, num)
+        self.board.set_numbers(placements)
+        self.solver.initialize(content)
+
     def s_exit_solve(self):
         """ Exit solve board state """
         self.msg.clear_msg()
@@ -289,14 +294,15 @@ class States(QObject):
 
         self.msg.clear_msg()
         if self.board.hint:
-            self.solver.remove_possibles()
+            self.board.remove_poss_tiles()
         if not self.step:
             self.gen = self.solver.get_next()
             self.step = True
         num_func = self.solver.solve_step(self.gen)
+        self.apply_changes()
         self.msg.show_msg(Cons.FUNC_MSGS[num_func])
         if self.board.hint:
-            self.solver.show_possibles()
+            self.show_possibles()
 
         self.machine.action_complete.emit()
 
@@ -345,7 +351,7 @@ class States(QObject):
         self.msg.show_msg(self.current_state)
 
         if not self.board.hint:
-            self.solver.show_possibles()
+            self.show_possibles()
         self.machine.action_complete.emit()
 
     def s_exit_hint(self):
@@ -353,7 +359,7 @@ class States(QObject):
         if not self.board.hint:
             self.board.hint = True
         else:
-            self.solver.remove_possibles()
+            self.board.remove_poss_tiles()
             self.board.hint = False
         self.msg.clear_msg()
         pass
@@ -368,7 +374,7 @@ class States(QObject):
         self.msg.show_msg(self.current_state)
 
         self.board.clear_board()
-        self.solver.initialize()
+        self.solver.initialize(self.board.content)
         self.step = False
         self.machine.action_complete.emit()
 
@@ -415,29 +421,17 @@ class States(QObject):
         self.machine.action_complete.emit()
 
     def create_svg(self):
-        c_size, r_size = Cons.SIZE_DICT[self.board_size]
-        v_lines_bold, h_lines_bold = [], []
-        v_lines_light, h_lines_light = [], []
+        geometry = self.board.geometry
         box = 326
         margin = 10
         rect = box - 2 * margin
         cell = rect // self.board_size
-        font = 24
+        font = Cons.PRINT_FONT.get(self.board_size, 24)
         font_size = round(font * 1.333)  # 20 pt in pxs
         y_adjust = round(font_size * 0.5) // 2 - cell // 2  # descenders approx 20-30% of font height
-        c_num, r_num = [margin + cell // 2], []
-        for line in range(1, self.board_size):
-            if line % c_size == 0:
-                v_lines_bold.append(margin + line * cell)
-            else:
-                v_lines_light.append(margin + line * cell)
-            c_num.append(margin + line * cell + cell // 2)
-        for line in range(1, self.board_size):
-            if line % r_size == 0:
-                h_lines_bold.append(margin + line * cell)
-            else:
-                h_lines_light.append(margin + line * cell)
-            r_num.append(margin + line * cell + y_adjust)
+        (v_lines_bold, v_lines_light), (h_lines_bold, h_lines_light) = geometry.grid_lines(cell, margin)
+        c_num = [margin + line * cell + cell // 2 for line in range(self.board_size)]
+        r_num = [margin + line * cell + y_adjust for line in range(1, self.board_size)]
         r_num.append(rect + margin + y_adjust)
 
         b_array = QByteArray()
@@ -455,9 +449,9 @@ class States(QObject):
 
         for r in range(self.board_size):
             for c in range(self.board_size):
-                num = self.board.content[r][c]
+                num = self.board.content.char(r, c)
                 if num != "0":
-                    if self.board.sudoku[r][c] != "0":
+                    if not self.board.sudoku.is_blank(r, c):
                         col = "black"
                     else:
                         col = "red"
@@ -518,7 +512,7 @@ class States(QObject):
         self.msg.show_msg(self.current_state)
 
         self.check = self.get_checks()
-        self.solver.initialize()
+        self.solver.initialize(self.board.content)
         self.choice = QWidget()
         self.choice.setWindowFlags(Qt.FramelessWindowHint)
         self.choice.setFixedSize(300, 350)
@@ -538,12 +532,9 @@ class States(QObject):
 
         if self.check == 1:
             self.write_log(self.log, "\nChecking for blank cells ...\n\n")
-            for r_no in range(self.board_size):
-                for c_no in range(self.board_size):
-                    if self.board.content[r_no][c_no] == '0':
-                        self.write_log(self.log,
-                                       "Blank at row " + str(r_no + 1) + " column " + str(c_no + 1) + "\n")
-                        self.error = True
+            for r_no, c_no in self.board.content.blanks():
+                self.write_log(self.log, "Blank at row " + str(r_no + 1) + " column " + str(c_no + 1) + "\n")
+                self.error = True
 
         elif self.check == 2:
             self.write_log(self.log, "\nChecking for missing nos ...\n\n")
@@ -560,7 +551,7 @@ class States(QObject):
                     self.test_list(col, nos, c_no, "Column")
 
             self.write_log(self.log, "\nChecking squares...\n\n")
-            squares = self.solver.squares
+            squares = self.board.geometry.squares
             for s_no in range(len(squares)):
                 squ = self.solver.get_square(s_no)
                 if not ((len(set(squ)) == len(squ) == max(squ)) and min(squ) == 1):
@@ -581,7 +572,7 @@ class States(QObject):
                     self.test_list(col, nos, c_no, "Column")
 
             self.write_log(self.log, "\nChecking squares...\n\n")
-            squares = self.solver.squares
+            squares = self.board.geometry.squares
             for s_no in range(len(squares)):
                 squ = self.solver.get_square(s_no)
                 if not ((len(set(squ)) == len(squ) == max(squ)) and min(squ) == 1):
@@ -589,15 +580,12 @@ class States(QObject):
 
         elif self.check == 4:
             self.write_log(self.log, "\nChecking numbers...\n\n")
-            solution = [[item for item in lst] for lst in self.board.sudoku]
-            self.solver.solve_grid(solution)
-            for r_no in range(self.board_size):
-                for c_no in range(self.board_size):
-                    if (self.board.content[r_no][c_no] != '0' and
-                            self.board.content[r_no][c_no] != solution[r_no][c_no]):
-                        self.write_log(self.log,
-                                       "Entry at row " + str(r_no + 1) + " column " + str(c_no + 1) + " incorrect\n")
-                        self.error = True
+            # Solved in the solver pool on copies, show_check() writes the result
+            self.check_request += 1
+            request = self.check_request
+            self.submit(self.pool.check(self.board.content, self.board.sudoku),
+                        lambda wrong: self.show_check(request, wrong))
+            return
 
         else:
             self.end_check()
@@ -605,6 +593,19 @@ class States(QObject):
         if not self.error:
             self.write_log(self.log, "\nNo errors found\n\n")
 
+    def show_check(self, request, wrong):
+        """ Write entries found wrong by the solver pool to the log
+            Dropped if the check has been closed or asked for again since """
+        if request != self.check_request or self.choice is None:
+            return
+        if wrong is None:
+            self.write_log(self.log, "No solution found for this board\n")
+            return
+        for r_no, c_no in wrong:
+            self.write_log(self.log, "Entry at row " + str(r_no + 1) + " column " + str(c_no + 1) + " incorrect\n")
+        if not wrong:
+            self.write_log(self.log, "\nNo errors found\n\n")
+
     def test_list(self, lst, nos, l_no, txt):
         counter = self.dups_count_dict(lst, nos)
         if self.check == 2:
@@ -658,6 +659,72 @@ class States(QObject):
         pass
 
     # -------------------------------------------------------------------------
+    def apply_changes(self):
+        """ Show numbers set by solver on board """
+        placements, _ = self.solver.take_changes()
+        self.board.set_numbers(placements)
+
+    def show_possibles(self):
+        """ Show possible values on board
+            Used by Hint """
+        for row in range(self.board.board_size):
+            for col in range(self.board.board_size):
+                poss = self.solver.get_possibles(row, col)
+                if poss:
+                    self.board.show_poss_tile(poss, row, col)
+
+    def redo_possibles(self):
+        """ Refresh possible values on board """
+        self.board.remove_poss_tiles()
+        self.solver.set_possible()
+        self.show_possibles()
+
+    def submit(self, future, handler):
+        """ Call handler with result of solver pool future in the GUI thread once it is done """
+        future.add_done_callback(lambda done: self.result_ready.emit(handler, done))
+
+    def handle_result(self, handler, future):
+        """ Pass result of finished solver pool request to its handler
+            A request that failed is logged and shown instead, one cancelled on quitting is dropped """
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as error:
+            logging.error("Solver pool request failed: %r", error)
+            QMessageBox.warning(QCoreApplication.instance().activeWindow(), "Solver Error",
+                                "The solver could not finish\n" + str(error))
+            return
+        handler(result)
+
+    def close_pool(self):
+        """ Stop the solver pool when the game quits, giving up searches still running """
+        self.pool.close(wait=False)
+
+    def check_solvable(self):
+        """ Warn if solver found board cannot be solved """
+        reason = self.solver.contradiction
+        if reason is not None:
+            QMessageBox.warning(QCoreApplication.instance().activeWindow(), "No Solution",
+                                "This board cannot be solved\n" + str(reason))
+
+    def check_unique(self):
+        """ Return True if board is empty or has exactly one solution
+            Otherwise warn that the setup is rejected """
+        if self.board.content.is_empty():
+            return True
+        reason = self.solver.contradiction
+        if reason is None:
+            solutions = qsolver.count_solutions(self.board.content)
+            if solutions == 1:
+                return True
+            text = "This board has more than one solution" if solutions else "This board cannot be solved"
+        else:
+            text = "This board cannot be solved\n" + str(reason)
+        QMessageBox.warning(QCoreApplication.instance().activeWindow(), "Setup Rejected",
+                            text + "\nPress Setup to change it")
+        return False
+
     def reset_board(self, size):
         """ Reset board """
         self.result = (None,)
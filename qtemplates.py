@@ -0,0 +1,83 @@
+""" Templates for the pattern overlay technique
+    A template is one way of placing a single digit in every row, column and square
+    Stored as a bitboard, bit row * size + col set for each cell used
+    Built once for each board size, cached on disk and loaded when first needed """
+
+import os
+import threading
+
+import qgeometry
+
+MAX_TEMPLATES = 50000  # Larger sets are too slow to filter, 9x9 has 46656
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+_templates = dict()  # Cache of template tuples by board size, None if too many
+_lock = threading.Lock()  # Held while templates are loaded, so the cache file is written once
+
+
+def get_templates(size):
+    """ Return tuple of template bitboards for board of size
+        Returns None if the board has more than MAX_TEMPLATES """
+    if size not in _templates:
+        with _lock:
+            if size not in _templates:
+                _templates[size] = load_templates(size)
+    return _templates[size]
+
+
+def count_templates(size):
+    """ Return number of templates for board of size without building them """
+    geometry = qgeometry.get_geometry(size)
+    # Each band places a digit in different stacks, each stack in different columns
+    stacks, bands = geometry.squares_across, geometry.squares_down
+    return factorial(stacks) ** bands * factorial(geometry.c_size) ** stacks
+
+
+def factorial(num):
+    """ Return num! """
+    result = 1
+    for i in range(2, num + 1):
+        result *= i
+    return result
+
+
+def load_templates(size):
+    """ Read templates from cache file, making and saving them if not there """
+    if count_templates(size) > MAX_TEMPLATES:
+        return None
+    width = (size * size + 7) // 8  # Bytes in each template
+    filename = os.path.join(CACHE_DIR, "templates_{}.bin".format(size))
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if len(data) == width * count_templates(size):
+            return tuple(int.from_bytes(data[i:i + width], 'little') for i in range(0, len(data), width))
+    except OSError:
+        pass
+    templates = make_templates(size)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(filename, 'wb') as f:
+            f.write(b"".join(template.to_bytes(width, 'little') for template in templates))
+    except OSError:
+        pass  # Cache is optional, templates are made again next time
+    return templates
+
+
+def make_templates(size):
+    """ Return tuple of all templates for board of size
+        Places the digit row by row in a column and square not yet used """
+    geometry = qgeometry.get_geometry(size)
+    templates = []
+
+    def extend(row, cols, squares, template):
+        if row == size:
+            templates.append(template)
+            return
+        for col in range(size):
+            square = geometry.square_of[row][col]
+            if not (cols >> col) & 1 and not (squares >> square) & 1:
+                extend(row + 1, cols | 1 << col, squares | 1 << square, template | 1 << (row * size + col))
+
+    extend(0, 0, 0, 0)
+    return tuple(templates)
@@ -0,0 +1,37 @@
+""" Regression checks for the solver
+    Run with: python -m unittest test_qsolver """
+
+import os
+import unittest
+
+import qbackends
+import qgrid
+import qsolver
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class TemplateTest(unittest.TestCase):
+
+    def test_set_possible_resets_templates(self):
+        """ Templates filtered against a wrong digit must not remove digits once it is lifted """
+        grid = qbackends.read_puzzles(os.path.join(DATA_DIR, "examples.txt"))[0]
+        solution = grid.copy()
+        qbackends.solve(solution)
+        solver = qsolver.Solver()
+        solver.initialize(grid.copy())
+        row, col = grid.blanks()[0]
+        wrong = next(code for code in range(1, grid.size + 1) if code != solution.get(row, col))
+        solver.content.set(row, col, wrong)
+        solver.set_possible()
+        solver.template()
+        solver.content.set(row, col, qgrid.BLANK)
+        solver.set_possible()
+        solver.template()
+        lost = [(r, c) for r, c in solver.content.blanks()
+                if not solver.possibles[r][c] & 1 << (solution.get(r, c) - 1)]
+        self.assertEqual(lost, [])
+
+
+if __name__ == '__main__':
+    unittest.main()